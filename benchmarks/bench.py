@@ -0,0 +1,275 @@
+"""
+Measure the client's own overhead against a local stub server.
+
+Run from the repository root::
+
+    $ python -m benchmarks.bench --output baseline.json
+    $ python -m benchmarks.bench --compare baseline.json
+
+With ``--compare`` the run exits with status 1 if any timing regressed by
+more than ``--tolerance`` relative to the saved baseline.
+"""
+import argparse
+import gzip
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from gremlinrestclient import ColumnarCollection, GremlinRestClient, Graph
+from gremlinrestclient.client import (PreparedScript, _build_payload,
+                                      _build_response, _compress)
+from gremlinrestclient.serializer import _SERIALIZERS
+
+from benchmarks.stub_server import (StubGremlinServer, make_body,
+                                    make_edges, make_vertices)
+
+
+# Metrics where a bigger number is an improvement, all others are timings
+HIGHER_IS_BETTER = ("requests_per_sec",)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = int(round(pct / 100.0 * (len(values) - 1)))
+    return values[index]
+
+
+def timeit(func, repeat):
+    """Best wall clock time of ``repeat`` calls of ``func``."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def make_elements(count):
+    """Half vertices, half edges chaining them together."""
+    elements = []
+    for i in range(count // 2):
+        elements.append({"label": "person", "name": "name%s" % i, "age": i})
+    for i in range(count - count // 2):
+        elements.append((i % (count // 2 or 1), "KNOWS",
+                         (i + 1) % (count // 2 or 1), {"weight": i}))
+    return elements
+
+
+def available_serializers():
+    serializers = []
+    for cls in _SERIALIZERS:
+        try:
+            serializers.append(cls())
+        except ImportError:
+            pass
+    return serializers
+
+
+def bench_execute(url, requests=2000):
+    latencies = []
+    with GremlinRestClient(url=url) as client:
+        client.execute("1 + 1")  # Warm up the connection pool
+        start = time.perf_counter()
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            client.execute("1 + 1")
+            latencies.append(time.perf_counter() - t0)
+        total = time.perf_counter() - start
+    return {
+        "requests_per_sec": requests / total,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000
+    }
+
+
+def repeats_for(count):
+    """More repeats for small inputs, where timings are noisier."""
+    return max(5, min(200, 20000 // max(count, 1)))
+
+
+def bench_create_script(count, templated=False):
+    graph = Graph(templated=templated)
+    # create pops labels off the dicts, so every run gets fresh elements
+    runs = [make_elements(count) for _ in range(repeats_for(count))]
+    best = None
+    for elements in runs:
+        start = time.perf_counter()
+        Graph.create(graph, *elements)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return {"seconds": best}
+
+
+def bench_encode(count):
+    """Request encoding for a constant script of ``count`` statements."""
+    repeat = repeats_for(count) * 10
+    client = GremlinRestClient()
+    gremlin = "".join("def v%s = g.V(x).next();" % i for i in range(count))
+    bindings = {"x": 1}
+    serializer = client.serializer
+    prepared = PreparedScript(client, gremlin, bindings=["x"])
+    return {
+        "seconds": timeit(lambda: serializer.dumps(
+            _build_payload(gremlin, bindings, "gremlin-groovy")), repeat),
+        "prepared_seconds": timeit(lambda: prepared.encode(bindings), repeat)
+    }
+
+
+def retained_bytes(graph, raw):
+    """Memory held by the collection built from the JSON ``raw``."""
+    tracemalloc.start()
+    try:
+        collection = graph._build_collection(json.loads(raw))
+        return tracemalloc.get_traced_memory()[0]
+    finally:
+        del collection
+        tracemalloc.stop()
+
+
+def bench_decode(count):
+    repeat = repeats_for(count)
+    body = make_body(make_vertices(count))
+    graph = Graph(lazy=False)
+    lazy_graph = Graph()
+    flat_graph = Graph(lazy=False, flatten=True)
+    data = [make_vertices(count), make_edges(count)]
+    raw = json.dumps(data)
+    results = {
+        "collection_seconds": timeit(
+            lambda: graph._build_collection(data), repeat),
+        "lazy_collection_seconds": timeit(
+            lambda: lazy_graph._build_collection(data), repeat),
+        "flat_collection_seconds": timeit(
+            lambda: flat_graph._build_collection(data), repeat),
+        "collection_retained_bytes": retained_bytes(graph, raw),
+        "flat_collection_retained_bytes": retained_bytes(flat_graph, raw),
+        "columnar_seconds": timeit(
+            lambda: ColumnarCollection.from_graphson(data), repeat),
+        "body_bytes": len(body)
+    }
+    for serializer in available_serializers():
+        results["%s_response_seconds" % serializer.name] = timeit(
+            lambda: _build_response(serializer.loads(body)), repeat)
+    return results
+
+
+def bench_compression(count, compression="gzip", level=6):
+    graph = Graph(templated=True)
+    script, bindings, alias = Graph.create(graph, *make_elements(count))
+    data = json.dumps({"gremlin": script + alias, "bindings": bindings,
+                       "language": "gremlin-groovy"}).encode("utf-8")
+    compressed = _compress(data, compression, level)
+    repeat = repeats_for(count)
+    return {
+        "raw_bytes": len(data),
+        "compressed_bytes": len(compressed),
+        "compress_seconds": timeit(
+            lambda: _compress(data, compression, level), repeat),
+        "decompress_seconds": timeit(
+            lambda: gzip.decompress(compressed), repeat)
+    }
+
+
+def compression_break_even(bandwidth_mbps):
+    """
+    Smallest request body for which gzip pays off on a link of
+    ``bandwidth_mbps``: the transfer time saved exceeds the time spent
+    compressing and decompressing. ``None`` if it never does for bodies up
+    to about a megabyte.
+    """
+    bytes_per_sec = bandwidth_mbps * 1e6 / 8
+    counts = [2 ** i for i in range(1, 15)]
+    for count in counts:
+        result = bench_compression(count)
+        saved = ((result["raw_bytes"] - result["compressed_bytes"]) /
+                 bytes_per_sec)
+        cost = result["compress_seconds"] + result["decompress_seconds"]
+        if saved > cost:
+            return result["raw_bytes"]
+    return None
+
+
+def run(sizes, bandwidth_mbps=100):
+    results = {}
+    with StubGremlinServer() as server:
+        results["execute"] = bench_execute(server.url)
+    for size in sizes:
+        results["create_script[%s]" % size] = bench_create_script(size)
+        results["create_script_templated[%s]" % size] = bench_create_script(
+            size, templated=True)
+        results["decode[%s]" % size] = bench_decode(size)
+        results["encode[%s]" % size] = bench_encode(size)
+        results["compression[%s]" % size] = bench_compression(size)
+    results["compression_break_even"] = {
+        "bandwidth_mbps": bandwidth_mbps,
+        "break_even_bytes": compression_break_even(bandwidth_mbps)
+    }
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.time()
+        },
+        "results": results
+    }
+
+
+def compare(baseline, current, tolerance):
+    """Return a list of human readable regressions."""
+    regressions = []
+    for name, metrics in current["results"].items():
+        old_metrics = baseline["results"].get(name, {})
+        for metric, value in metrics.items():
+            old = old_metrics.get(metric)
+            if not old or metric.endswith("_bytes"):
+                continue
+            if metric in HIGHER_IS_BETTER:
+                change = (old - value) / old
+            else:
+                change = (value - old) / old
+            if change > tolerance:
+                regressions.append("%s %s: %.4g -> %.4g (%+.0f%%)" % (
+                    name, metric, old, value, change * 100))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="10,100,1000,10000",
+                        help="comma separated element counts")
+    parser.add_argument("--bandwidth-mbps", type=float, default=100,
+                        help="link speed used for the compression "
+                             "break-even estimate (default 100)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON file to check against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative slowdown (default 0.25)")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    current = run(sizes, args.bandwidth_mbps)
+    for name in sorted(current["results"]):
+        metrics = current["results"][name]
+        print("%-34s %s" % (name, ", ".join(
+            "%s=%s" % (k, "%.4g" % v if v is not None else "n/a")
+            for k, v in sorted(metrics.items()))))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.tolerance)
+        for regression in regressions:
+            print("REGRESSION %s" % regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
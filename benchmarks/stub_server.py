@@ -0,0 +1,124 @@
+"""
+An in-process stand in for the Gremlin Server REST endpoint. It does not
+evaluate Gremlin, it answers every script with a canned response body.
+"""
+import gzip
+import json
+import threading
+import zlib
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+
+def make_body(data, code=200, meta=None):
+    """Encode a successful Gremlin Server response body."""
+    return json.dumps({
+        "requestId": "00000000-0000-0000-0000-000000000000",
+        "status": {"code": code, "message": "", "attributes": {}},
+        "result": {"data": data, "meta": meta or {}}
+    }).encode("utf-8")
+
+
+def make_vertices(count, num_props=2):
+    """Generate vertices shaped like the server's GraphSON output."""
+    vertices = []
+    for i in range(count):
+        props = {}
+        for j in range(num_props):
+            key = "prop%s" % j
+            props[key] = [{"id": count + i * num_props + j,
+                           "value": "value%s" % i}]
+        vertices.append({"id": i, "label": "person", "type": "vertex",
+                         "properties": props})
+    return vertices
+
+
+def make_edges(count):
+    """Generate edges shaped like the server's GraphSON output."""
+    return [{"id": i, "label": "KNOWS", "type": "edge", "inV": i + 1,
+             "outV": i, "inVLabel": "person", "outVLabel": "person",
+             "properties": {"weight": 1}} for i in range(count)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"  # Keep-alive, like Gremlin Server
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("content-length", 0))
+        body = self.rfile.read(length)
+        encoding = self.headers.get("content-encoding")
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        elif encoding == "deflate":
+            body = zlib.decompress(body)
+        payload = json.loads(body.decode("utf-8"))
+        status, body = self.server.lookup(payload["gremlin"])
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        if (self.server.compress_responses and
+                "gzip" in self.headers.get("accept-encoding", "")):
+            body = gzip.compress(body)
+            self.send_header("content-encoding", "gzip")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+
+class StubGremlinServer(object):
+    """
+    Serve canned responses on localhost in a background thread.
+
+    :param int port: Port to bind, 0 picks a free one.
+    :param bool compress_responses: gzip response bodies for clients that
+        accept it. Compressed request bodies are always accepted.
+    """
+
+    def __init__(self, port=0, compress_responses=False):
+        self._server = _ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.lookup = self._lookup
+        self._server.compress_responses = compress_responses
+        self._responses = {}
+        self._default = (200, make_body([2]))
+        self._thread = None
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:%s" % self._server.server_address[1]
+
+    def respond(self, gremlin, data, status=200):
+        """Answer ``gremlin`` with ``data`` as the result data."""
+        if status == 200:
+            body = make_body(data)
+        else:
+            body = json.dumps({"message": data}).encode("utf-8")
+        self._responses[gremlin] = (status, body)
+
+    def _lookup(self, gremlin):
+        return self._responses.get(gremlin, self._default)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
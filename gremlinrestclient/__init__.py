@@ -1,5 +1,17 @@
+from gremlinrestclient.balancer import *
+from gremlinrestclient.batching import *
+from gremlinrestclient.cache import *
 from gremlinrestclient.client import *
 from gremlinrestclient.exceptions import *
+from gremlinrestclient.export import *
 from gremlinrestclient.graph import *
+from gremlinrestclient.columnar import *
+from gremlinrestclient.importer import *
+from gremlinrestclient.limiter import *
+from gremlinrestclient.retry import *
+from gremlinrestclient.serializer import *
+from gremlinrestclient.singleflight import *
+from gremlinrestclient.stats import *
+from gremlinrestclient.stream import *
 
 __version__ = "0.0.10"
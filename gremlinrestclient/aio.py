@@ -0,0 +1,155 @@
+"""asyncio versions of the client and graph classes. Requires aiohttp."""
+import asyncio
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+from gremlinrestclient.cache import ResultCache
+from gremlinrestclient.client import (GremlinRestClient, _build_payload,
+                                      _build_response, _raise_status_error)
+from gremlinrestclient.graph import Graph
+from gremlinrestclient.serializer import get_serializer
+from gremlinrestclient.singleflight import AsyncSingleFlight
+
+
+__all__ = ("AsyncGremlinRestClient", "AsyncTinkerGraph", "AsyncTitanGraph")
+
+
+class AsyncGremlinRestClient(object):
+    """
+    Coroutine based counterpart of
+    :py:class:`GremlinRestClient<gremlinrestclient.client.GremlinRestClient>`.
+    Requests share one :py:class:`aiohttp.ClientSession`.
+
+    :param str url: Gremlin Server url.
+    :param int max_in_flight: Maximum number of requests awaiting a response
+        at any time. Further calls to :py:meth:`execute` wait for a slot.
+    :param int pool_maxsize: Maximum number of connections kept alive per
+        host.
+    :param serializer: JSON serializer for request and response bodies. See
+        :py:func:`get_serializer<gremlinrestclient.serializer.get_serializer>`.
+    :param bool coalesce: Default for the ``coalesce`` argument of
+        :py:meth:`execute`.
+    """
+
+    HEADERS = GremlinRestClient.HEADERS
+
+    def __init__(self, url="http://localhost:8182", max_in_flight=100,
+                 pool_maxsize=100, serializer=None, coalesce=False):
+        if aiohttp is None:
+            raise ImportError(
+                "AsyncGremlinRestClient requires aiohttp: "
+                "pip install gremlinrestclient[aio]")
+        self._url = url
+        self._serializer = get_serializer(serializer)
+        self._max_in_flight = max_in_flight
+        self._pool_maxsize = pool_maxsize
+        self._session = None
+        self._semaphore = None
+        self._coalesce = coalesce
+        self._single_flight = AsyncSingleFlight()
+
+    @property
+    def max_in_flight(self):
+        return self._max_in_flight
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=self._pool_maxsize)
+            self._session = aiohttp.ClientSession(
+                connector=connector, headers=self.HEADERS)
+        return self._session
+
+    def _get_semaphore(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_in_flight)
+        return self._semaphore
+
+    async def close(self):
+        """Close all pooled connections."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def execute(self, gremlin, bindings=None, lang="gremlin-groovy",
+                      query_timeout=None, coalesce=None):
+        """
+        Send a script to the Gremlin Server
+
+        :param str gremlin: The script to send.
+        :param dict bindings: Bindings for the Gremlin Script.
+        :param str lang: Gremlin language variant.
+        :param bool coalesce: Share the response of an identical request
+            in flight, see
+            :py:meth:`GremlinRestClient.execute<gremlinrestclient.client.GremlinRestClient.execute>`.
+
+        :returns: :py:class:`Response<gremlinrestclient.client.Response>`
+        """
+        if coalesce is None:
+            coalesce = self._coalesce
+        if coalesce:
+            key = ResultCache.key(gremlin, bindings, lang)
+            return await self._single_flight.do(
+                key, lambda: self._execute(gremlin, bindings, lang,
+                                           query_timeout))
+        return await self._execute(gremlin, bindings, lang, query_timeout)
+
+    async def _execute(self, gremlin, bindings, lang, query_timeout):
+        payload = _build_payload(gremlin, bindings, lang)
+        data = self._serializer.dumps(payload)
+        resp = await self._post(self._url, data, query_timeout)
+        return _build_response(resp)
+
+    async def _post(self, url, data, post_timeout=None):
+        timeout = aiohttp.ClientTimeout(total=post_timeout)
+        async with self._get_semaphore():
+            async with self._get_session().post(
+                    url, data=data, timeout=timeout) as resp:
+                status_code = resp.status
+                if status_code == 403:
+                    _raise_status_error(status_code, None)
+                body = self._serializer.loads(await resp.read())
+        if status_code != 200:
+            _raise_status_error(status_code, body["message"])
+        return body
+
+
+class AsyncTinkerGraph(AsyncGremlinRestClient, Graph):
+
+    def __init__(self, url="http://localhost:8182", templated=False,
+                 columnar=False, lazy=True, flatten=False,
+                 property_ids=False, **kwargs):
+        AsyncGremlinRestClient.__init__(self, url=url, **kwargs)
+        Graph.__init__(self, templated=templated, columnar=columnar,
+                       lazy=lazy, flatten=flatten, property_ids=property_ids)
+
+    async def create(self, *elements):
+        script, bindings, alias = Graph.create(self, *elements)
+        return await self._create(self._finish_script(script, alias),
+                                  bindings)
+
+    async def upsert(self, *elements, key="name"):
+        script, bindings, alias = Graph.upsert(self, *elements, key=key)
+        return await self._create(self._finish_script(script, alias),
+                                  bindings)
+
+    async def _create(self, script, bindings):
+        resp = await self.execute(script, bindings=bindings)
+        return self._build_collection(resp.data)
+
+
+class AsyncTitanGraph(AsyncTinkerGraph):
+
+    def __init__(self, url="http://localhost:8182", **kwargs):
+        super(AsyncTitanGraph, self).__init__(url=url, **kwargs)
+
+    def _finish_script(self, script, alias):
+        return "%s%s%s" % (script, "graph.tx().commit();", alias)
@@ -0,0 +1,248 @@
+"""Client side load balancing over several Gremlin Servers."""
+import itertools
+import threading
+import time
+
+import requests
+
+from gremlinrestclient.exceptions import (EndpointUnavailableError,
+                                          StatusException)
+
+
+__all__ = ("CircuitBreaker", "Endpoint", "LoadBalancer")
+
+
+# Status codes that say something about the server, not the script
+UNHEALTHY_STATUS_CODES = (500, 503, 598)
+
+
+class CircuitBreaker(object):
+    """
+    Stop sending requests to a host after repeated failures. Once
+    ``recovery_timeout`` has passed the breaker is half open and lets
+    ``half_open_requests`` probe requests through; a successful probe
+    closes it again, a failed one reopens it.
+
+    :param int failure_threshold: Consecutive failures that open the breaker.
+    :param float recovery_timeout: Seconds to stay open.
+    :param int half_open_requests: Concurrent probes allowed when half open.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, recovery_timeout=5.0,
+                 half_open_requests=1, clock=time.time):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_requests = half_open_requests
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probes = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if (self._state == self.OPEN and
+                self._clock() - self._opened_at >= self.recovery_timeout):
+            self._state = self.HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def allow(self):
+        """Whether a request may be sent now. Counts half open probes."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and self._probes < self.half_open_requests:
+                self._probes += 1
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if (self._state == self.HALF_OPEN or
+                    self._failures >= self.failure_threshold):
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+    def trip(self):
+        """Open the breaker now, however many failures were consecutive."""
+        with self._lock:
+            self._failures += 1
+            self._state = self.OPEN
+            self._opened_at = self._clock()
+
+
+class Endpoint(object):
+    """
+    A Gremlin Server url with passively tracked health: requests in flight,
+    and moving averages of latency and error rate.
+
+    :param str url: Gremlin Server url.
+    :param float slow_threshold: Requests slower than this many seconds
+        count as failures for the circuit breaker.
+    :param float decay: Weight of the newest observation in the moving
+        averages.
+    """
+
+    def __init__(self, url, breaker=None, slow_threshold=None, decay=0.2):
+        self.url = url
+        self.breaker = breaker or CircuitBreaker()
+        self.slow_threshold = slow_threshold
+        self.decay = decay
+        self.outstanding = 0
+        self.requests = 0
+        self.latency = None
+        self.error_rate = 0.0
+
+    def observe(self, latency, failed):
+        """
+        Record a finished request. ``latency`` is ``None`` for errors, whose
+        timing, such as a refused connection, says nothing about how fast
+        the host answers.
+        """
+        self.requests += 1
+        if latency is None:
+            pass
+        elif self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.decay * (latency - self.latency)
+        self.error_rate += self.decay * (float(failed) - self.error_rate)
+
+    @property
+    def cost(self):
+        """
+        Expected wait, used by least outstanding selection. Ties, such as
+        hosts without latency data, go to the one with fewer requests.
+        """
+        return ((self.outstanding + 1) * (self.latency or 0.0),
+                self.outstanding)
+
+    def __repr__(self):
+        return "Endpoint(%r, state=%s, outstanding=%s)" % (
+            self.url, self.breaker.state, self.outstanding)
+
+
+class LoadBalancer(object):
+    """
+    Spread requests over several Gremlin Servers, skipping hosts whose
+    circuit breaker is open.
+
+    Besides consecutive failures, a breaker opens when the host's moving
+    error rate reaches ``error_rate_threshold``, so a host failing every
+    other request is taken out too. A host whose average latency exceeds
+    ``slow_factor`` times that of the fastest other host counts its
+    requests as failures, so a degraded host stops receiving its full
+    share until its latency recovers.
+
+    :param urls: Gremlin Server urls.
+    :param str strategy: "round_robin", or "least_outstanding" to pick the
+        host with the fewest requests in flight, weighted by its latency.
+    :param int failure_threshold: See
+        :py:class:`CircuitBreaker<gremlinrestclient.balancer.CircuitBreaker>`.
+    :param float recovery_timeout: See
+        :py:class:`CircuitBreaker<gremlinrestclient.balancer.CircuitBreaker>`.
+    :param float slow_threshold: See
+        :py:class:`Endpoint<gremlinrestclient.balancer.Endpoint>`.
+    :param float error_rate_threshold: Moving error rate that opens a
+        host's breaker, ``None`` to disable.
+    :param float slow_factor: How many times slower than the fastest other
+        host a host may be on average before its requests count as
+        failures, ``None`` to disable.
+    :param int min_requests: Requests a host must have answered before its
+        error rate can open the breaker.
+    """
+
+    STRATEGIES = ("round_robin", "least_outstanding")
+
+    def __init__(self, urls, strategy="round_robin", failure_threshold=5,
+                 recovery_timeout=5.0, slow_threshold=None,
+                 error_rate_threshold=0.5, slow_factor=5.0, min_requests=10):
+        if strategy not in self.STRATEGIES:
+            raise ValueError("Unknown strategy %s" % strategy)
+        self.strategy = strategy
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_factor = slow_factor
+        self.min_requests = min_requests
+        self.endpoints = [
+            Endpoint(url, CircuitBreaker(failure_threshold, recovery_timeout),
+                     slow_threshold=slow_threshold)
+            for url in urls]
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Choose an endpoint for a request. Must be paired with
+        :py:meth:`release`.
+        """
+        if self.strategy == "round_robin":
+            start = next(self._counter)
+            count = len(self.endpoints)
+            candidates = [self.endpoints[(start + i) % count]
+                          for i in range(count)]
+        else:
+            with self._lock:
+                candidates = sorted(self.endpoints,
+                                    key=lambda endpoint: endpoint.cost)
+        for endpoint in candidates:
+            if endpoint.breaker.allow():
+                with self._lock:
+                    endpoint.outstanding += 1
+                return endpoint
+        raise EndpointUnavailableError(
+            "All Gremlin Server endpoints are unavailable: %s" % ", ".join(
+                endpoint.url for endpoint in self.endpoints))
+
+    def release(self, endpoint, latency, error=None):
+        """Report the outcome of a request made to ``endpoint``."""
+        errored = is_unhealthy(error)
+        failed = errored or (
+            endpoint.slow_threshold is not None and
+            latency > endpoint.slow_threshold)
+        with self._lock:
+            endpoint.outstanding -= 1
+            failed = failed or self._degraded(endpoint)
+            endpoint.observe(None if errored else latency, failed)
+            trip = (failed and self.error_rate_threshold is not None and
+                    endpoint.requests >= self.min_requests and
+                    endpoint.error_rate >= self.error_rate_threshold)
+        if trip:
+            endpoint.breaker.trip()
+        elif failed:
+            endpoint.breaker.record_failure()
+        else:
+            endpoint.breaker.record_success()
+
+    def _degraded(self, endpoint):
+        if self.slow_factor is None or endpoint.latency is None:
+            return False
+        others = [other.latency for other in self.endpoints
+                  if other is not endpoint and other.latency is not None]
+        return bool(others) and (
+            endpoint.latency > self.slow_factor * min(others))
+
+
+def is_unhealthy(error):
+    """Whether ``error`` points at a problem with the server itself."""
+    if error is None:
+        return False
+    if isinstance(error, StatusException):
+        return error.value in UNHEALTHY_STATUS_CODES
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
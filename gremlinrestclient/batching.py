@@ -0,0 +1,159 @@
+"""Automatic batching of small scripts into combined requests."""
+import threading
+import time
+from concurrent import futures
+
+from gremlinrestclient.client import Response
+from gremlinrestclient.exceptions import GremlinServerError
+
+
+__all__ = ("MicroBatcher",)
+
+
+# Gremlin Server status for a script that failed to compile or evaluate
+SCRIPT_EVALUATION_ERROR = 597
+
+# Start of the Groovy compiler's error message. Over HTTP Gremlin Server
+# reports a script that does not compile with status 500, so the message is
+# how such a failure is told apart from a server error.
+_COMPILE_ERROR = "startup failed"
+
+# Turns a script's result into a list, the way Gremlin Server does for a
+# whole response
+_AS_LIST = "org.apache.tinkerpop.gremlin.util.iterator.IteratorUtils.asList"
+
+
+class MicroBatcher(object):
+    """
+    Combine the scripts sent by concurrent callers into one request. The
+    first call of a batch waits up to ``max_wait`` seconds for more calls,
+    or until ``max_size`` calls have arrived. It then sends all of them as
+    one script and hands each caller its own
+    :py:class:`Response<gremlinrestclient.client.Response>`.
+
+    Each script runs in a closure whose parameters are its bindings, so
+    binding names can not clash between calls. An error in one script is
+    raised to its own caller only. If the combined script fails to compile,
+    the calls are sent again one by one.
+
+    Calls block, so the batcher is meant for many threads sharing one
+    client. Create one with
+    :py:meth:`GremlinRestClient.batcher<gremlinrestclient.client.GremlinRestClient.batcher>`.
+
+    :param client: A
+        :py:class:`GremlinRestClient<gremlinrestclient.client.GremlinRestClient>`.
+    :param float max_wait: Seconds the first call of a batch waits for
+        others.
+    :param int max_size: Maximum number of calls per request.
+    :param float query_timeout: Timeout of the combined requests.
+    """
+
+    def __init__(self, client, max_wait=0.002, max_size=32,
+                 query_timeout=None):
+        self.client = client
+        self.max_wait = max_wait
+        self.max_size = max_size
+        self.query_timeout = query_timeout
+        self._cond = threading.Condition()
+        self._batch = []
+
+    def execute(self, gremlin, bindings=None):
+        """
+        Send a Gremlin-Groovy script as part of the next batch.
+
+        :param str gremlin: The script to send.
+        :param dict bindings: Bindings for the Gremlin Script.
+
+        :returns: :py:class:`Response<gremlinrestclient.client.Response>`
+        """
+        future = futures.Future()
+        with self._cond:
+            batch = self._batch
+            batch.append((gremlin, bindings or {}, future))
+            leader = len(batch) == 1
+            if len(batch) >= self.max_size:
+                self._batch = []
+                self._cond.notify_all()
+        if leader:
+            deadline = time.monotonic() + self.max_wait
+            with self._cond:
+                while self._batch is batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._batch = []
+                        break
+                    self._cond.wait(remaining)
+            self._send(batch)
+        return future.result()
+
+    def _send(self, batch):
+        if len(batch) == 1:
+            self._send_each(batch)
+            return
+        script, bindings = _combine(batch)
+        try:
+            resp = self.client.execute(script, bindings=bindings,
+                                       query_timeout=self.query_timeout)
+        except GremlinServerError as e:
+            if _failed_to_compile(e):
+                # One call's syntax error breaks the whole script
+                self._send_each(batch)
+                return
+            _fail(batch, e)
+            return
+        except Exception as e:
+            _fail(batch, e)
+            return
+        for (_, _, future), (ok, data) in zip(batch, resp.data):
+            if ok:
+                future.set_result(Response(resp.status_code, data,
+                                           resp.message, resp.metadata))
+            else:
+                future.set_exception(
+                    GremlinServerError(SCRIPT_EVALUATION_ERROR, data))
+        if len(resp.data) < len(batch):
+            _fail(batch[len(resp.data):], RuntimeError(
+                "Batch of %d scripts returned %d results" %
+                (len(batch), len(resp.data))))
+
+    def _send_each(self, batch):
+        for gremlin, bindings, future in batch:
+            try:
+                resp = self.client.execute(gremlin, bindings=bindings,
+                                           query_timeout=self.query_timeout)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(resp)
+
+
+def _combine(calls):
+    """
+    Build one script returning ``[succeeded, result or message]`` for each
+    ``(gremlin, bindings, ...)`` in ``calls``, and its bindings.
+    """
+    parts = []
+    combined = {}
+    for i, call in enumerate(calls):
+        gremlin, bindings = call[:2]
+        names = sorted(bindings)
+        args = []
+        for name in names:
+            arg = "b%s_%s" % (i, name)
+            combined[arg] = bindings[name]
+            args.append(arg)
+        parts.append(
+            "{ -> try { [true, %s({ %s ->\n%s\n}.call(%s))] } "
+            "catch (Throwable t) { [false, t.toString()] } }.call()" % (
+                _AS_LIST, ", ".join(names), gremlin, ", ".join(args)))
+    return "[\n%s\n]" % ",\n".join(parts), combined
+
+
+def _failed_to_compile(error):
+    return (error.value == SCRIPT_EVALUATION_ERROR or
+            _COMPILE_ERROR in error.message)
+
+
+def _fail(batch, error):
+    for _, _, future in batch:
+        future.set_exception(error)
@@ -0,0 +1,103 @@
+"""Client side cache for the responses of read only scripts."""
+import collections
+import hashlib
+import json
+import threading
+import time
+
+
+__all__ = ("ResultCache",)
+
+
+class ResultCache(object):
+    """
+    A thread safe LRU cache of
+    :py:class:`Response<gremlinrestclient.client.Response>` objects with an
+    optional time to live. Cached responses are shared between callers, so
+    they must not be modified.
+
+    ``generation`` counts invalidations. Read it before sending a request
+    and pass it to :py:meth:`set`, so that a response that may predate an
+    invalidation is not cached.
+
+    :param int maxsize: Maximum number of cached responses.
+    :param float ttl: Seconds before an entry expires, ``None`` for never.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, clock=time.time):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._clock = clock
+        self._entries = collections.OrderedDict()
+        self._tags = collections.defaultdict(set)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+
+    @staticmethod
+    def key(gremlin, bindings, lang):
+        """Stable hash of a request."""
+        raw = json.dumps([gremlin, bindings or {}, lang], sort_keys=True,
+                         default=repr)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """The cached value for ``key``, or ``None``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or
+                                      entry[1] > self._clock()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def set(self, key, value, tags=(), generation=None):
+        """
+        Cache ``value``.
+
+        :param tags: Names that can be passed to :py:meth:`invalidate` to
+            drop this entry.
+        :param int generation: The :py:attr:`generation` read before
+            ``value`` was requested. If the cache has been invalidated
+            since, ``value`` is not cached.
+        """
+        expires = None
+        if self._ttl is not None:
+            expires = self._clock() + self._ttl
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires, tuple(tags))
+            for tag in tags:
+                self._tags[tag].add(key)
+            while len(self._entries) > self._maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tag=None):
+        """Drop the entries with ``tag``, or every entry."""
+        with self._lock:
+            self.generation += 1
+            if tag is None:
+                self._entries.clear()
+                self._tags.clear()
+            else:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+    def __len__(self):
+        return len(self._entries)
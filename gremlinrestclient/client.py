@@ -1,12 +1,27 @@
 import collections
-import json
+import functools
+import gzip
+import itertools
+import re
+import threading
+import time
+import zlib
+from concurrent import futures
 
 import requests
 
-from gremlinrestclient.exceptions import RequestError, GremlinServerError
+from gremlinrestclient.balancer import LoadBalancer
+from gremlinrestclient.cache import ResultCache
+from gremlinrestclient.exceptions import (RequestError, GremlinServerError,
+                                          StatusException)
+from gremlinrestclient.retry import HedgePolicy, RetryPolicy
+from gremlinrestclient.serializer import get_serializer
+from gremlinrestclient.singleflight import SingleFlight
+from gremlinrestclient.stats import ClientStats, RequestMetrics
+from gremlinrestclient.stream import ResponseStream
 
 
-__all__ = ("GremlinRestClient", "Response")
+__all__ = ("GremlinRestClient", "PreparedScript", "Response")
 
 Response = collections.namedtuple(
     "Response",
@@ -14,47 +29,593 @@ Response = collections.namedtuple(
 
 
 class GremlinRestClient(object):
+    """
+    Submit scripts to the Gremlin Server REST endpoint. All requests go
+    through a persistent :py:class:`requests.Session`, so connections are
+    kept alive and reused between calls.
 
-    HEADERS = {'content-type': 'application/json'}
+    :param url: Gremlin Server url, or a list of urls to balance requests
+        over.
+    :param int pool_connections: Number of per-host connection pools to cache.
+    :param int pool_maxsize: Maximum number of connections kept alive per
+        host.
+    :param bool pool_block: Block when a host's pool is exhausted instead of
+        opening an extra, non-pooled connection.
+    :param serializer: JSON serializer for request and response bodies. See
+        :py:func:`get_serializer<gremlinrestclient.serializer.get_serializer>`;
+        by default requests are encoded with the fastest installed library.
+    :param cache: A :py:class:`ResultCache<gremlinrestclient.cache.ResultCache>`
+        used by calls to :py:meth:`execute` with ``cached=True``.
+    :param retry_policy: The :py:class:`RetryPolicy<gremlinrestclient.retry.RetryPolicy>`
+        used by calls to :py:meth:`execute` with ``retry=True``.
+    :param hedge_policy: The :py:class:`HedgePolicy<gremlinrestclient.retry.HedgePolicy>`
+        used by calls to :py:meth:`execute` with ``hedge=True``.
+    :param balancer: A :py:class:`LoadBalancer<gremlinrestclient.balancer.LoadBalancer>`
+        to use instead of ``url``, for control over its strategy and health
+        checks.
+    :param str compression: "gzip" or "deflate" to compress request bodies
+        of at least ``compression_threshold`` bytes. Compressed responses
+        are always accepted and decoded.
+    :param int compression_threshold: Smallest request body, in bytes, that
+        is compressed.
+    :param int compression_level: zlib compression level, 1 to 9.
+    :param bool coalesce: Default for the ``coalesce`` argument of
+        :py:meth:`execute`.
+    :param limiter: An
+        :py:class:`AIMDLimiter<gremlinrestclient.limiter.AIMDLimiter>`,
+        :py:class:`GradientLimiter<gremlinrestclient.limiter.GradientLimiter>`
+        or other
+        :py:class:`ConcurrencyLimiter<gremlinrestclient.limiter.ConcurrencyLimiter>`
+        that adapts the number of requests in flight to the server's
+        latency and errors. Its current limit is reported as the
+        ``concurrency_limit`` gauge of :py:attr:`stats`.
+    """
 
-    def __init__(self, url="http://localhost:8182"):
-        self._url = url
+    HEADERS = {'content-type': 'application/json',
+               'accept-encoding': 'gzip, deflate'}
 
-    def execute(self, gremlin, bindings=None, lang="gremlin-groovy", query_timeout=None):
+    HOOK_EVENTS = ("before_request", "after_request", "create")
+
+    def __init__(self, url="http://localhost:8182", pool_connections=10,
+                 pool_maxsize=10, pool_block=False, serializer=None,
+                 cache=None, retry_policy=None, hedge_policy=None,
+                 balancer=None, compression=None, compression_threshold=1024,
+                 compression_level=6, coalesce=False, limiter=None):
+        if compression not in COMPRESSIONS:
+            raise ValueError("Unknown compression %s" % compression)
+        self._compression = compression
+        self._compression_threshold = compression_threshold
+        self._compression_level = compression_level
+        if balancer is None and not isinstance(url, str):
+            balancer = LoadBalancer(url)
+        self._balancer = balancer
+        # With a balancer the url is chosen per request
+        self._url = url if balancer is None else None
+        self._serializer = get_serializer(serializer)
+        self._cache = cache
+        self._coalesce = coalesce
+        self._single_flight = SingleFlight()
+        self._retry_policy = retry_policy or RetryPolicy()
+        self._hedge_policy = hedge_policy or HedgePolicy()
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        self._pool_block = pool_block
+        self._session = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self.stats = ClientStats()
+        self._limiter = limiter
+        if limiter is not None:
+            self.stats.gauges["concurrency_limit"] = lambda: limiter.limit
+            self.stats.gauges["in_flight"] = lambda: limiter.in_flight
+        self._hooks = dict((event, []) for event in self.HOOK_EVENTS)
+
+    def register_hook(self, event, callback):
+        """
+        Call ``callback`` on every occurrence of ``event``.
+
+        :param str event: "before_request" and "after_request" callbacks
+            receive a :py:class:`RequestMetrics<gremlinrestclient.stats.RequestMetrics>`,
+            "create" callbacks a :py:class:`CreateMetrics<gremlinrestclient.stats.CreateMetrics>`.
+        :param callback: Callable taking one argument.
+        """
+        if event not in self._hooks:
+            raise ValueError("Unknown hook event %s" % event)
+        self._hooks[event].append(callback)
+
+    def _fire(self, event, metrics):
+        for callback in self._hooks[event]:
+            callback(metrics)
+
+    @property
+    def balancer(self):
+        return self._balancer
+
+    @property
+    def serializer(self):
+        return self._serializer
+
+    @property
+    def limiter(self):
+        return self._limiter
+
+    @property
+    def cache(self):
+        return self._cache
+
+    @property
+    def session(self):
+        """Lazily created :py:class:`requests.Session` used for all posts."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._make_session()
+        return self._session
+
+    @property
+    def executor(self):
+        """
+        Lazily created thread pool for requests made in the background,
+        sized to the connection pool.
+        """
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = futures.ThreadPoolExecutor(
+                        max_workers=self._pool_maxsize)
+        return self._executor
+
+    def _make_session(self):
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self._pool_connections,
+            pool_maxsize=self._pool_maxsize,
+            pool_block=self._pool_block)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update(self.HEADERS)
+        return session
+
+    def close(self):
+        """Close all pooled connections."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def execute(self, gremlin, bindings=None, lang="gremlin-groovy", query_timeout=None,
+                cached=False, cache_tags=(), retry=None, hedge=None,
+                coalesce=None):
         """
         Send a script to the Gremlin Server
 
         :param str gremlin: The script to send.
         :param dict bindings: Bindings for the Gremlin Script.
         :param str lang: Gremlin language variant.
+        :param bool cached: Serve the response from the client's cache when
+            possible. Only use this for read only scripts.
+        :param cache_tags: Tags for the cached response, see
+            :py:meth:`ResultCache.invalidate<gremlinrestclient.cache.ResultCache.invalidate>`.
+        :param retry: ``True`` to retry failures with the client's retry
+            policy, or a :py:class:`RetryPolicy<gremlinrestclient.retry.RetryPolicy>`.
+            Only use this for idempotent scripts.
+        :param hedge: ``True`` to hedge slow requests with the client's hedge
+            policy, or a :py:class:`HedgePolicy<gremlinrestclient.retry.HedgePolicy>`.
+            Only use this for idempotent scripts.
+        :param bool coalesce: While an identical request (same script,
+            bindings and language) is in flight, wait for it and share its
+            response or exception instead of sending another one. Only use
+            this for read only scripts, and do not modify the shared
+            response. Defaults to the client's ``coalesce`` setting.
 
         :returns: :py:class:`Response<gremlinrestclient.client.Response>`
         """
-        if bindings is None:
-            bindings = {}
-        payload = {
-            "gremlin": gremlin,
-            "bindings": bindings,
-            "language": lang
-        }
-        resp = self._post(self._url, json.dumps(payload), query_timeout)
-        resp = resp.json()
-        resp = Response(resp["status"]["code"],
-                        resp["result"]["data"],
-                        resp["status"]["message"],
-                        resp["result"]["meta"])
-        return resp
+        return self._dispatch(gremlin, bindings, lang, query_timeout, cached,
+                              cache_tags, retry, hedge, coalesce)
+
+    def prepare(self, gremlin, lang="gremlin-groovy", bindings=None):
+        """
+        Prepare a script that is executed many times with different
+        bindings. The script and language are encoded once, so each call
+        only encodes its bindings.
+
+        :param str gremlin: The script.
+        :param str lang: Gremlin language variant.
+        :param bindings: Names of the bindings the script expects. Raises
+            :py:class:`ValueError` for names the script does not use.
+
+        :returns: :py:class:`PreparedScript<gremlinrestclient.client.PreparedScript>`
+        """
+        return PreparedScript(self, gremlin, lang, bindings)
+
+    def batcher(self, max_wait=0.002, max_size=32, query_timeout=None):
+        """
+        Combine small scripts sent concurrently from several threads into
+        fewer requests.
+
+        :param float max_wait: Seconds the first call of a batch waits for
+            others.
+        :param int max_size: Maximum number of calls per request.
+        :param float query_timeout: Timeout of the combined requests.
+
+        :returns: :py:class:`MicroBatcher<gremlinrestclient.batching.MicroBatcher>`
+        """
+        # Imported here, batching depends on this module
+        from gremlinrestclient.batching import MicroBatcher
+        return MicroBatcher(self, max_wait=max_wait, max_size=max_size,
+                            query_timeout=query_timeout)
+
+    def _dispatch(self, gremlin, bindings, lang, query_timeout, cached,
+                  cache_tags, retry, hedge, coalesce, encode=None):
+        def send():
+            return self._send(gremlin, bindings, lang, query_timeout, retry,
+                              hedge, encode)
+        if coalesce is None:
+            coalesce = self._coalesce
+        cache = self._cache if cached else None
+        key = None
+        if cache is not None:
+            key = cache.key(gremlin, bindings, lang)
+            resp = cache.get(key)
+            if resp is not None:
+                return resp
+            fetch = send
+
+            def send():
+                # Skipped if a create invalidated the cache meanwhile, the
+                # response may predate it
+                generation = cache.generation
+                resp = fetch()
+                cache.set(key, resp, tags=cache_tags, generation=generation)
+                return resp
+        if coalesce:
+            key = key or ResultCache.key(gremlin, bindings, lang)
+            send = functools.partial(self._single_flight.do, key, send)
+        return send()
+
+    def _send(self, gremlin, bindings, lang, query_timeout, retry, hedge,
+              encode=None):
+        def attempt():
+            return self._execute(gremlin, bindings, lang, query_timeout,
+                                 encode)
+        call = attempt
+        if hedge:
+            if hedge is True:
+                hedge = self._hedge_policy
+
+            def call():
+                return hedge.call(attempt, self.executor,
+                                  self.stats.histograms["total_seconds"])
+        if retry:
+            if retry is True:
+                retry = self._retry_policy
+            return retry.call(call)
+        return call()
+
+    def invalidate_cache(self, tag=None):
+        """Drop cached responses with ``tag``, or all of them."""
+        if self._cache is not None:
+            self._cache.invalidate(tag)
+
+    def _execute(self, gremlin, bindings, lang, query_timeout, encode=None):
+        metrics = RequestMetrics(gremlin)
+        start = time.perf_counter()
+        try:
+            if encode is not None:
+                data = encode(bindings)
+            else:
+                data = self._serializer.dumps(
+                    _build_payload(gremlin, bindings, lang))
+            metrics.request_bytes = len(data)
+            sent = time.perf_counter()
+            metrics.encode_seconds = sent - start
+            self._fire("before_request", metrics)
+            resp = self._post(self._url, data, query_timeout)
+            received = time.perf_counter()
+            metrics.network_seconds = received - sent
+            metrics.wait_seconds = resp.elapsed.total_seconds()
+            metrics.status_code = resp.status_code
+            metrics.response_bytes = len(resp.content)
+            resp = _build_response(self._serializer.loads(resp.content))
+            metrics.decode_seconds = time.perf_counter() - received
+            if isinstance(resp.data, list):
+                metrics.result_count = len(resp.data)
+            return resp
+        except Exception as e:
+            metrics.error = e
+            if isinstance(e, StatusException):
+                metrics.status_code = e.value
+            raise
+        finally:
+            metrics.total_seconds = time.perf_counter() - start
+            self.stats.record(metrics)
+            self._fire("after_request", metrics)
+
+    def execute_stream(self, gremlin, bindings=None, lang="gremlin-groovy",
+                       query_timeout=None, chunk_size=65536):
+        """
+        Send a script to the Gremlin Server and iterate over the result data
+        as it is received, instead of loading the whole response at once.
+
+        :param str gremlin: The script to send.
+        :param dict bindings: Bindings for the Gremlin Script.
+        :param str lang: Gremlin language variant.
+        :param int chunk_size: Number of bytes read from the socket at a time.
+
+        :returns: :py:class:`ResponseStream<gremlinrestclient.stream.ResponseStream>`
+        """
+        payload = _build_payload(gremlin, bindings, lang)
+        data = self._serializer.dumps(payload)
+        resp = self._post(self._url, data, query_timeout, stream=True)
+        return ResponseStream(resp, chunk_size=chunk_size)
+
+    def execute_many(self, requests, max_workers=None, ordered=True):
+        """
+        Execute many independent scripts in parallel over the client's
+        connection pool.
+
+        :param requests: Iterable of requests, each either a script, a
+            ``(script, bindings)`` tuple or a dict of keyword arguments for
+            :py:meth:`execute`. It is consumed lazily.
+        :param int max_workers: Number of requests in flight. Defaults to
+            the connection pool size.
+        :param bool ordered: Yield results in input order. Otherwise yield
+            ``(index, result)`` pairs as requests complete.
+
+        :returns: An iterator of results. A result is a
+            :py:class:`Response<gremlinrestclient.client.Response>`, or the
+            exception raised by that request.
+        """
+        max_workers = max_workers or self._pool_maxsize
 
-    def _post(self, url, data, post_timeout=None):
-        resp = requests.post(url, data=data, headers=self.HEADERS, timeout=post_timeout)
+        def run(request):
+            try:
+                return self.execute(**_request_kwargs(request))
+            except Exception as e:
+                return e
+
+        executor = futures.ThreadPoolExecutor(max_workers=max_workers)
+        requests = enumerate(requests)
+        # Bound the number of submitted requests so the input can be large
+        window = max_workers * 2
+        pending = collections.deque()
+        try:
+            for index, request in itertools.islice(requests, window):
+                pending.append((index, executor.submit(run, request)))
+            while pending:
+                if ordered:
+                    index, future = pending.popleft()
+                    done = [(index, future)]
+                    future.result()
+                else:
+                    futures.wait([f for _, f in pending],
+                                 return_when=futures.FIRST_COMPLETED)
+                    done = [(i, f) for i, f in pending if f.done()]
+                    pending = collections.deque(
+                        (i, f) for i, f in pending if not f.done())
+                for index, request in itertools.islice(requests, len(done)):
+                    pending.append((index, executor.submit(run, request)))
+                for index, future in done:
+                    if ordered:
+                        yield future.result()
+                    else:
+                        yield index, future.result()
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def execute_paged(self, traversal, bindings=None, page_size=1000,
+                      prefetch=1, lang="gremlin-groovy", query_timeout=None):
+        """
+        Page through the results of a traversal with ``range`` windows,
+        fetching the next pages in the background while the current one is
+        consumed.
+
+        :param str traversal: A traversal that can be suffixed with
+            ``.range(lo, hi)``.
+        :param dict bindings: Bindings for the Gremlin Script.
+        :param int page_size: Number of results per request.
+        :param int prefetch: Number of pages to request ahead of the one
+            being consumed. 0 fetches one page at a time.
+        :param str lang: Gremlin language variant.
+
+        :returns: An iterator over the result data, which stops after the
+            first page shorter than ``page_size``.
+        """
+        script = "%s.range(%s, %s)" % (traversal.rstrip().rstrip(";"),
+                                       _PAGE_LOW, _PAGE_HIGH)
+
+        def fetch(page):
+            page_bindings = dict(bindings or {})
+            page_bindings[_PAGE_LOW] = page * page_size
+            page_bindings[_PAGE_HIGH] = (page + 1) * page_size
+            return self.execute(script, bindings=page_bindings, lang=lang,
+                                query_timeout=query_timeout).data
+
+        if not prefetch:
+            page = 0
+            while True:
+                data = fetch(page)
+                for item in data:
+                    yield item
+                if len(data) < page_size:
+                    return
+                page += 1
+
+        executor = futures.ThreadPoolExecutor(max_workers=prefetch)
+        pending = collections.deque(
+            executor.submit(fetch, page) for page in range(prefetch + 1))
+        next_page = prefetch + 1
+        try:
+            while True:
+                data = pending.popleft().result()
+                last = len(data) < page_size
+                if not last:
+                    pending.append(executor.submit(fetch, next_page))
+                    next_page += 1
+                for item in data:
+                    yield item
+                if last:
+                    return
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _post(self, url, data, post_timeout=None, stream=False):
+        headers = self.HEADERS
+        if (self._compression is not None and
+                len(data) >= self._compression_threshold):
+            data = _compress(data, self._compression, self._compression_level)
+            headers = dict(headers)
+            headers["content-encoding"] = self._compression
+        if self._limiter is None:
+            return self._post_balanced(url, data, headers, post_timeout,
+                                       stream)
+        self._limiter.acquire()
+        start = time.perf_counter()
+        error = None
+        try:
+            return self._post_balanced(url, data, headers, post_timeout,
+                                       stream)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._limiter.release(time.perf_counter() - start, error)
+
+    def _post_balanced(self, url, data, headers, post_timeout, stream):
+        if url is not None:
+            return self._post_url(url, data, headers, post_timeout, stream)
+        endpoint = self._balancer.acquire()
+        start = time.perf_counter()
+        error = None
+        try:
+            return self._post_url(endpoint.url, data, headers, post_timeout,
+                                  stream)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._balancer.release(endpoint, time.perf_counter() - start,
+                                   error)
+
+    def _post_url(self, url, data, headers, post_timeout, stream):
+        resp = self.session.post(url, data=data, headers=headers,
+                                 timeout=post_timeout, stream=stream)
         status_code = resp.status_code
         if status_code != 200:
-            if status_code == 403:
-                raise RuntimeError(
-                    "403 Forbidden: Server must be configured for REST")
-            msg = resp.json()["message"]
-            if resp.status_code < 500:
-                raise RequestError(resp.status_code, msg)
-            else:
-                raise GremlinServerError(resp.status_code, msg)
+            msg = None
+            if status_code != 403:
+                msg = self._serializer.loads(resp.content)["message"]
+            _raise_status_error(status_code, msg)
         return resp
+
+
+COMPRESSIONS = (None, "gzip", "deflate")
+
+
+# Binding names used for execute_paged windows
+_PAGE_LOW = "_pageLow"
+_PAGE_HIGH = "_pageHigh"
+
+
+def _request_kwargs(request):
+    if isinstance(request, dict):
+        return request
+    if isinstance(request, tuple):
+        gremlin, bindings = request
+        return {"gremlin": gremlin, "bindings": bindings}
+    return {"gremlin": request}
+
+
+def _compress(data, compression, level):
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=level)
+    return zlib.compress(data, level)
+
+
+class PreparedScript(object):
+    """
+    A script bound to a client, returned by
+    :py:meth:`GremlinRestClient.prepare`. Calling it executes the script,
+    taking the same keyword arguments as
+    :py:meth:`GremlinRestClient.execute`, except for ``gremlin`` and
+    ``lang``.
+    """
+
+    def __init__(self, client, gremlin, lang="gremlin-groovy",
+                 bindings=None):
+        self.client = client
+        self.gremlin = gremlin
+        self.lang = lang
+        self._names = frozenset(_IDENTIFIER.findall(gremlin))
+        if bindings is not None:
+            self._check(bindings)
+        self._serializer = client.serializer
+        # The body up to the bindings value, always ends with "}"
+        head = self._serializer.dumps({"gremlin": gremlin, "language": lang})
+        self._head = head[:-1] + b',"bindings":'
+
+    def _check(self, names):
+        if not self._names.issuperset(names):
+            unknown = set(names) - self._names
+            raise ValueError("Bindings not used by the script: %s" %
+                             ", ".join(sorted(unknown)))
+
+    def encode(self, bindings=None):
+        """The request body for ``bindings``."""
+        return b"".join((self._head, self._serializer.dumps(bindings or {}),
+                         b"}"))
+
+    def __call__(self, bindings=None, query_timeout=None, cached=False,
+                 cache_tags=(), retry=None, hedge=None, coalesce=None):
+        if bindings:
+            self._check(bindings)
+        return self.client._dispatch(self.gremlin, bindings, self.lang,
+                                     query_timeout, cached, cache_tags,
+                                     retry, hedge, coalesce, self.encode)
+
+    execute = __call__
+
+    def __repr__(self):
+        return "PreparedScript(%r, lang=%r)" % (self.gremlin, self.lang)
+
+
+_IDENTIFIER = re.compile(r"[A-Za-z_$][\w$]*")
+
+
+def _build_payload(gremlin, bindings, lang):
+    if bindings is None:
+        bindings = {}
+    return {
+        "gremlin": gremlin,
+        "bindings": bindings,
+        "language": lang
+    }
+
+
+def _build_response(resp):
+    return Response(resp["status"]["code"],
+                    resp["result"]["data"],
+                    resp["status"]["message"],
+                    resp["result"]["meta"])
+
+
+def _raise_status_error(status_code, msg):
+    if status_code == 403:
+        raise RuntimeError(
+            "403 Forbidden: Server must be configured for REST")
+    if status_code < 500:
+        raise RequestError(status_code, msg)
+    else:
+        raise GremlinServerError(status_code, msg)
@@ -0,0 +1,141 @@
+"""Column oriented storage for vertices and edges returned by the server."""
+import array
+import collections
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+from gremlinrestclient.graph import Collection, Edge, Vertex
+
+
+__all__ = ("VertexColumns", "EdgeColumns", "ColumnarCollection")
+
+
+VertexColumns = collections.namedtuple(
+    "VertexColumns",
+    ["ids", "labels", "properties"])
+
+
+EdgeColumns = collections.namedtuple(
+    "EdgeColumns",
+    ["ids", "source_ids", "labels", "target_ids", "properties"])
+
+
+class ColumnarCollection(collections.namedtuple(
+        "ColumnarCollection", ["vertices", "edges"])):
+    """
+    A :py:class:`Collection<gremlinrestclient.graph.Collection>` stored as
+    columns. ``vertices`` is a
+    :py:class:`VertexColumns<gremlinrestclient.columnar.VertexColumns>` and
+    ``edges`` an :py:class:`EdgeColumns<gremlinrestclient.columnar.EdgeColumns>`,
+    with ``properties`` mapping each property key to a column. Columns of
+    ints or floats are NumPy arrays if NumPy is installed, otherwise
+    :py:class:`array.array`. Other columns are lists, with ``None`` where an
+    element lacks a property. Vertex property columns hold the first value
+    of each property.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_graphson(cls, data):
+        """Build from ``[vertices, edges]`` as returned by the server."""
+        vertices, edges = data
+        ids, labels, props = [], [], {}
+        for i, vertex in enumerate(vertices):
+            ids.append(vertex["id"])
+            labels.append(vertex["label"])
+            _add_properties(props, i, vertex.get("properties", {}))
+        vertex_columns = VertexColumns(
+            _column(ids), labels, _finish_properties(props, len(ids)))
+
+        ids, source_ids, labels, target_ids, props = [], [], [], [], {}
+        for i, edge in enumerate(edges):
+            ids.append(edge["id"])
+            source_ids.append(edge["outV"])
+            labels.append(edge["label"])
+            target_ids.append(edge["inV"])
+            _add_properties(props, i, edge.get("properties", {}))
+        edge_columns = EdgeColumns(
+            _column(ids), _column(source_ids), labels, _column(target_ids),
+            _finish_properties(props, len(ids)))
+        return cls(vertex_columns, edge_columns)
+
+    def to_collection(self):
+        """
+        Convert to a :py:class:`Collection<gremlinrestclient.graph.Collection>`.
+        Properties are plain ``{key: value}`` dicts.
+        """
+        vertices = self.vertices
+        props = _rows(vertices.properties, len(vertices.ids))
+        vertex_tuple = tuple(
+            Vertex(*row) for row in zip(_to_list(vertices.ids),
+                                        vertices.labels, props))
+        edges = self.edges
+        props = _rows(edges.properties, len(edges.ids))
+        edge_tuple = tuple(
+            Edge(*row) for row in zip(_to_list(edges.ids),
+                                      _to_list(edges.source_ids),
+                                      edges.labels,
+                                      _to_list(edges.target_ids), props))
+        return Collection(vertex_tuple, edge_tuple)
+
+
+def _add_properties(columns, index, properties):
+    for key, value in properties.items():
+        if isinstance(value, list):
+            # Vertex property: [{"id": ..., "value": ...}, ...]
+            value = value[0]["value"] if value else None
+        column = columns.get(key)
+        if column is None:
+            column = columns[key] = []
+        if len(column) < index:
+            column.extend([None] * (index - len(column)))
+        column.append(value)
+
+
+def _finish_properties(columns, length):
+    finished = {}
+    for key, column in columns.items():
+        if len(column) < length:
+            column.extend([None] * (length - len(column)))
+        finished[key] = _column(column)
+    return finished
+
+
+def _column(values):
+    kind = None
+    for value in values:
+        value_type = type(value)
+        if value_type is int and kind != "d":
+            kind = "q"
+        elif value_type is float or value_type is int:
+            kind = "d"
+        else:
+            return values
+    if kind is None:
+        return values
+    try:
+        if numpy is not None:
+            dtype = numpy.int64 if kind == "q" else numpy.float64
+            return numpy.array(values, dtype=dtype)
+        return array.array(kind, values)
+    except OverflowError:
+        return values
+
+
+def _to_list(column):
+    if isinstance(column, list):
+        return column
+    return column.tolist()
+
+
+def _rows(properties, length):
+    rows = [{} for _ in range(length)]
+    for key, column in properties.items():
+        for row, value in zip(rows, _to_list(column)):
+            if value is not None:
+                row[key] = value
+    return rows
@@ -1,6 +1,6 @@
 """Gremlin Server exceptions."""
 
-__all__ = ("RequestError", "GremlinServerError")
+__all__ = ("RequestError", "GremlinServerError", "EndpointUnavailableError")
 
 
 class StatusException(IOError):
@@ -60,3 +60,8 @@ class RequestError(StatusException):
 
 class GremlinServerError(StatusException):
     pass
+
+
+class EndpointUnavailableError(IOError):
+    """Raised when every configured Gremlin Server is marked unavailable."""
+    pass
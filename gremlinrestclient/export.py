@@ -0,0 +1,76 @@
+"""Export the graph to JSON lines files."""
+import json
+import numbers
+import threading
+from concurrent import futures
+
+from gremlinrestclient.exceptions import GremlinServerError
+
+
+__all__ = ("export_jsonl", "split_range")
+
+
+def export_jsonl(graph, path, edges=False, label=None, workers=4,
+                 page_size=1000, ranges_per_worker=4):
+    """
+    Write every vertex, or edge, to ``path`` as one GraphSON object per
+    line. The id range is split into parts that are scanned in parallel
+    with :py:meth:`scan_vertices<gremlinrestclient.graph.TinkerGraph.scan_vertices>`,
+    so lines are not written in id order. Memory use is bounded by one page
+    per worker.
+
+    Graphs whose ids are not numbers are scanned by a single worker.
+
+    :param graph: A :py:class:`TinkerGraph<gremlinrestclient.graph.TinkerGraph>`
+        or :py:class:`TitanGraph<gremlinrestclient.graph.TitanGraph>`.
+    :param str path: File to write.
+    :param bool edges: Export edges instead of vertices.
+    :param str label: Only export elements with this label.
+    :param int workers: Number of ranges scanned at the same time.
+    :param int page_size: Elements per request.
+    :param int ranges_per_worker: The id range is split into
+        ``workers * ranges_per_worker`` parts, so workers that finish early
+        can take over remaining parts of unevenly filled ranges.
+
+    :returns: The number of elements written.
+    """
+    step = "E" if edges else "V"
+    try:
+        low, high = graph.id_bounds(edges=edges, label=label)
+    except GremlinServerError:
+        # TinkerPop 3.0's min() and max() only accept numbers
+        ranges = [(None, None)]
+    else:
+        if low is None:
+            ranges = []
+        elif (isinstance(low, numbers.Integral) and
+                isinstance(high, numbers.Integral)):
+            ranges = split_range(low, high + 1, workers * ranges_per_worker)
+        else:
+            ranges = [(None, None)]
+    lock = threading.Lock()
+    with open(path, "w") as f:
+        def scan(bounds):
+            count = 0
+            for page in graph._scan_pages(step, label, page_size, *bounds):
+                lines = "".join(json.dumps(element) + "\n"
+                                for element in page)
+                with lock:
+                    f.write(lines)
+                count += len(page)
+            return count
+
+        with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            return sum(executor.map(scan, ranges))
+
+
+def split_range(low, high, parts):
+    """Split ``[low, high)`` into at most ``parts`` contiguous ranges."""
+    parts = max(1, min(parts, high - low))
+    step, extra = divmod(high - low, parts)
+    ranges = []
+    for i in range(parts):
+        end = low + step + (1 if i < extra else 0)
+        ranges.append((low, end))
+        low = end
+    return ranges
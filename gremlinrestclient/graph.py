@@ -1,10 +1,21 @@
 import collections
+import functools
+import itertools
+import json
+import numbers
+import sys
+import threading
+from collections.abc import Sequence
+from concurrent import futures
 
 from gremlinrestclient.client import GremlinRestClient
+from gremlinrestclient.exceptions import GremlinServerError
+from gremlinrestclient.stats import CreateMetrics
 
 
 __all__ = ("TitanGraph", "TinkerGraph", "Graph", "Vertex", "Edge",
-           "Collection")
+           "Collection", "LazyElements", "TransactionBatch",
+           "VertexProperty")
 
 
 Vertex = collections.namedtuple(
@@ -23,14 +34,199 @@ Collection = collections.namedtuple(
 )
 
 
+VertexProperty = collections.namedtuple(
+    "VertexProperty",
+    ["id", "value", "properties"])
+
+
+def _make_vertex(v):
+    return Vertex(v["id"], v["label"], v["properties"])
+
+
+def _make_edge(e):
+    return Edge(e["id"], e["outV"], e["label"], e["inV"],
+                e.get("properties", {}))
+
+
+def _make_flat_vertex(v, property_ids=False):
+    intern = sys.intern
+    props = {}
+    for key, values in v["properties"].items():
+        if property_ids:
+            values = [VertexProperty(p["id"], p["value"], p.get("properties"))
+                      for p in values]
+            value = values[0] if len(values) == 1 else values
+        elif len(values) == 1:
+            value = values[0]["value"]
+        else:
+            value = [p["value"] for p in values]
+        props[intern(key)] = value
+    return Vertex(v["id"], intern(v["label"]), props)
+
+
+def _make_flat_edge(e):
+    intern = sys.intern
+    props = dict((intern(key), value)
+                 for key, value in e.get("properties", {}).items())
+    return Edge(e["id"], e["outV"], intern(e["label"]), e["inV"], props)
+
+
+class LazyElements(Sequence):
+    """
+    A read only sequence of :py:class:`Vertex<gremlinrestclient.graph.Vertex>`
+    or :py:class:`Edge<gremlinrestclient.graph.Edge>` objects that are only
+    built from the decoded server response when accessed.
+    """
+
+    __slots__ = ("_raw", "_factory")
+
+    def __init__(self, raw, factory):
+        self._raw = raw
+        self._factory = factory
+
+    def ids(self):
+        """The element ids, without building any elements."""
+        return [element["id"] for element in self._raw]
+
+    def __len__(self):
+        return len(self._raw)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self._factory(e) for e in self._raw[index])
+        return self._factory(self._raw[index])
+
+    def __iter__(self):
+        factory = self._factory
+        for element in self._raw:
+            yield factory(element)
+
+    def __eq__(self, other):
+        if isinstance(other, (LazyElements, tuple, list)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(tuple(self))
+
+
+# Fixed create scripts used in templated mode. The data travels in the
+# "vertices" and "edges" bindings, so the server compiles each script once.
+_VERTEX_TEMPLATE = (
+    "def created = [];"
+    "def vs = vertices.collect { v -> "
+    "if (v[0] != null) { return g.V(v[0]).next() }; "
+    "def kvs = v[1] ? [label, v[1]] + v[2] : v[2]; "
+    "def nv = graph.addVertex(kvs as Object[]); "
+    "created << nv; nv };")
+
+_EDGE_TEMPLATE = (
+    "def es = edges.collect { e -> "
+    "vs[e[0]].addEdge(e[1], vs[e[2]], e[3] as Object[]) };")
+
+# Get or create script used by upsert. Existing vertices are found with one
+# lookup on the key property per label, "" standing for any label; an edge is
+# reused if its source already has an edge with the same label to the target.
+_UPSERT_TEMPLATE = (
+    "def found = [:];"
+    "keyValues.each { l, values -> "
+    "(l ? g.V().hasLabel(l) : g.V()).has(upsertKey, within(values)).toList()"
+    ".each { v -> found[[l, v.value(upsertKey).toString()]] = v } };"
+    "def vs = vertices.collect { v -> "
+    "if (v[0] != null) { return g.V(v[0]).next() }; "
+    "def k = [v[1] ?: '', v[3].toString()]; "
+    "def existing = found[k]; "
+    "if (existing != null) { return existing }; "
+    "def kvs = v[1] ? [label, v[1]] + v[2] : v[2]; "
+    "def nv = graph.addVertex(kvs as Object[]); "
+    "found[k] = nv; nv };"
+    "def es = edges.collect { e -> "
+    "def source = vs[e[0]]; def target = vs[e[2]]; "
+    "def old = source.edges(Direction.OUT, e[1])"
+    ".find { it.inVertex() == target }; "
+    "old != null ? old : source.addEdge(e[1], target, e[3] as Object[]) };")
+
+# Several templated creates committed in one transaction. "creates" holds
+# the [vertices, edges] bindings of each create.
+_BATCH_TEMPLATE = (
+    "def results; try { results = creates.collect { c -> "
+    "def vertices = c[0]; def edges = c[1]; " + _VERTEX_TEMPLATE +
+    _EDGE_TEMPLATE + " [created, es] }; graph.tx().commit() } "
+    "catch (e) { graph.tx().rollback(); throw e }; results;")
+
+
+_SCAN_LABEL = "_scanLabel"
+_SCAN_FROM = "_scanFrom"
+_SCAN_HIGH = "_scanHigh"
+_SCAN_LIMIT = "_scanLimit"
+
+# Key bulk_create adds to node dicts it created but no longer tracks, so a
+# later reference raises instead of creating the node again
+_UNTRACKED = object()
+
+
+def _is_integer(value):
+    return isinstance(value, numbers.Integral) and not isinstance(value, bool)
+
+
+def _scan_script(step, label, low, high, after):
+    script = "g.%s()" % step
+    if label is not None:
+        script += ".hasLabel(%s)" % _SCAN_LABEL
+    if after is not None:
+        script += ".has(T.id, P.gt(%s))" % _SCAN_FROM
+    elif low is not None:
+        script += ".has(T.id, P.gte(%s))" % _SCAN_FROM
+    if high is not None:
+        script += ".has(T.id, P.lt(%s))" % _SCAN_HIGH
+    return script + ".order().by(T.id, Order.incr).limit(%s)" % _SCAN_LIMIT
+
+
 class Graph:
     """
     A script factory for the Gremlin Server that defines the common interface
     for the Tinkerpop3 backends.
+
+    :param bool templated: Send one of a small set of constant scripts that
+        loop over the elements passed as bindings, instead of a script
+        written for each call. This lets Gremlin Server reuse its compiled
+        scripts.
+    :param bool columnar: Return created elements as a
+        :py:class:`ColumnarCollection<gremlinrestclient.columnar.ColumnarCollection>`.
+    :param bool lazy: Return created elements as
+        :py:class:`LazyElements<gremlinrestclient.graph.LazyElements>`, only
+        building each Vertex or Edge when it is accessed. ``False`` builds
+        tuples up front.
+    :param bool flatten: Store a vertex property with a single value as the
+        plain value instead of ``[{"id": ..., "value": ...}]``, and one with
+        several values as a list of values. Labels and property keys are
+        interned, so they are shared between elements. Combine with
+        ``lazy=False`` so the decoded response can be freed.
+    :param bool property_ids: With ``flatten``, keep vertex property ids
+        and meta-properties by storing
+        :py:class:`VertexProperty<gremlinrestclient.graph.VertexProperty>`
+        objects instead of plain values.
     """
-    def __init__(self):
-        self._vertex_alias = 0
-        self._edge_alias = 0
+    def __init__(self, templated=False, columnar=False, lazy=True,
+                 flatten=False, property_ids=False):
+        self._vertex_alias = itertools.count()
+        self._edge_alias = itertools.count()
+        # State of the create call being built, per thread so that threads
+        # can share a graph
+        self._local = threading.local()
+        self._templated = templated
+        self._columnar = columnar
+        self._lazy = lazy
+        self._flat = flatten
+        self._property_ids = property_ids
 
     def create(self, *elements):
         """
@@ -41,20 +237,18 @@ class Graph:
             :py:class:`dict` that can be cast to a Vertex or a
             :py:class:`tuple` that can be cast to an Edge.
         """
-        self._vertex_alias_list = []
-        self._edge_alias_list = []
-        self._param_id = 0
-
-        vertices, edges = self._divide_elements(elements)
+        vertices, edges = self._prepare(elements)
+        if self._templated:
+            return self._parse_templated(vertices, edges)
         vert_script, vert_bindings = self._parse_vertices(vertices)
         edge_script, edge_bindings = self._parse_edges(edges)
-        if self._vertex_alias_list:
-            vertex_alias = ",".join(self._vertex_alias_list)
+        if self._local.vertex_alias_list:
+            vertex_alias = ",".join(self._local.vertex_alias_list)
         else:
             vertex_alias = ""
         vertex_alias = "[" + vertex_alias + "]"
-        if self._edge_alias_list:
-            edge_alias = ",".join(self._edge_alias_list)
+        if self._local.edge_alias_list:
+            edge_alias = ",".join(self._local.edge_alias_list)
         else:
             edge_alias = ""
         edge_alias = "[" + edge_alias + "]"
@@ -64,6 +258,33 @@ class Graph:
         vert_bindings.update(edge_bindings)
         return script, vert_bindings, alias
 
+    def upsert(self, *elements, key="name"):
+        """
+        Get or create nodes and edges. Nodes are matched on their label and
+        the ``key`` property, with one lookup per label, and only the
+        missing ones are created. A node without a label matches a node
+        with any label. Edges are only created if their source has no edge with
+        the same label to their target. Properties of existing elements are
+        left as they are.
+
+        :param elements: Elements accepted by :py:meth:`create`. Nodes that
+            are dicts must have the ``key`` property; nodes with the same
+            label and key value are sent once.
+        :param str key: Property that identifies a node.
+        """
+        vertices, edges = self._prepare(elements)
+        return self._parse_upsert(vertices, edges, key)
+
+    def _finish_script(self, script, alias):
+        return "%s%s" % (script, alias)
+
+    def _prepare(self, elements):
+        self._local.vertex_alias_list = []
+        self._local.edge_alias_list = []
+        self._local.new_vertices = []
+        self._local.param_id = 0
+        return self._divide_elements(elements)
+
     def _divide_elements(self, elements):
         """
         A bit ugly, but this parses the mumbo jumbo the user can pass.
@@ -75,11 +296,10 @@ class Graph:
                 vertices[id(arg)] = self._process_vertex(arg, vertices, elements)
             elif isinstance(arg, tuple):
                 source, label, target = arg[:3]
-                properties = arg[3:4] or {}
+                properties = arg[3] if len(arg) > 3 else {}
                 source_vertex = self._process_vertex(source, vertices, elements)
                 target_vertex = self._process_vertex(target, vertices, elements)
-                alias = "e%s" % str(self._edge_alias)
-                self._edge_alias += 1
+                alias = "e%s" % next(self._edge_alias)
                 edge = source_vertex, label, target_vertex, properties, alias
                 edges.append(edge)
             else:
@@ -112,14 +332,34 @@ class Graph:
         else:
             raise ValueError('%s can\'t be a vertex' % type(vertex))
 
-        alias = "v%s" % str(self._vertex_alias)
-        self._vertex_alias += 1
+        alias = "v%s" % next(self._vertex_alias)
         vertex_dict["alias"] = alias
         return vertex_dict
 
+    def _build_collection(self, data):
+        if self._columnar:
+            # Imported here, columnar depends on this module
+            from gremlinrestclient.columnar import ColumnarCollection
+            return ColumnarCollection.from_graphson(data)
+        make_vertex, make_edge = self._factories()
+        if self._lazy:
+            return Collection(LazyElements(data[0], make_vertex),
+                              LazyElements(data[1], make_edge))
+        vertices = tuple(make_vertex(v) for v in data[0])
+        edges = tuple(make_edge(e) for e in data[1])
+        return Collection(vertices, edges)
+
+    def _factories(self):
+        if not self._flat:
+            return _make_vertex, _make_edge
+        if self._property_ids:
+            return (functools.partial(_make_flat_vertex, property_ids=True),
+                    _make_flat_edge)
+        return _make_flat_vertex, _make_flat_edge
+
     def _get_param(self):
-        param = "p%s" % str(self._param_id)
-        self._param_id += 1
+        param = "p%s" % self._local.param_id
+        self._local.param_id += 1
         return param
 
     def _parse_vertices(self, vertices):
@@ -133,7 +373,8 @@ class Graph:
                 script += "%s = g.V(%s).next();" % (alias, param)
                 bindings[param] = vertex["id"]
             else:
-                self._vertex_alias_list.append(alias)
+                self._local.vertex_alias_list.append(alias)
+                self._local.new_vertices.append(vertex)
                 add_vertex = "%s = graph.addVertex(" % alias
                 label = vertex["label"]
                 props = vertex["properties"]
@@ -149,6 +390,80 @@ class Graph:
                 script += add_vertex
         return script, bindings
 
+    def _parse_templated(self, vertices, edges):
+        positions = {}
+        vertex_data = []
+        for vertex in vertices:
+            positions[vertex["alias"]] = len(vertex_data)
+            if vertex["id"] != "":
+                vertex_data.append([vertex["id"], None, []])
+            else:
+                self._local.vertex_alias_list.append(vertex["alias"])
+                self._local.new_vertices.append(vertex)
+                vertex_data.append([None, vertex["label"] or None,
+                                    self._flatten(vertex["properties"])])
+        edge_data = []
+        for source, label, target, props, alias in edges:
+            self._local.edge_alias_list.append(alias)
+            edge_data.append([positions[source["alias"]], label,
+                              positions[target["alias"]],
+                              self._flatten(props)])
+        bindings = {"vertices": vertex_data}
+        script = _VERTEX_TEMPLATE
+        if edge_data:
+            bindings["edges"] = edge_data
+            script += _EDGE_TEMPLATE
+            alias = "[created, es];"
+        else:
+            alias = "[created, []];"
+        return script, bindings, alias
+
+    def _parse_upsert(self, vertices, edges, key):
+        positions = {}
+        by_key = {}
+        vertex_data = []
+        for vertex in vertices:
+            alias = vertex["alias"]
+            if vertex["id"] != "":
+                positions[alias] = len(vertex_data)
+                vertex_data.append([vertex["id"], None, [], None])
+                continue
+            props = vertex["properties"]
+            if key not in props:
+                raise ValueError("Vertex %r has no %r property to upsert by"
+                                 % (props, key))
+            value = props[key]
+            label = vertex["label"] or ""
+            if (label, value) in by_key:
+                positions[alias] = by_key[(label, value)]
+                continue
+            by_key[(label, value)] = positions[alias] = len(vertex_data)
+            self._local.new_vertices.append(vertex)
+            vertex_data.append([None, vertex["label"] or None,
+                                self._flatten(props), value])
+        edge_data = []
+        seen = set()
+        for source, label, target, props, alias in edges:
+            edge = (positions[source["alias"]], label,
+                    positions[target["alias"]])
+            if edge in seen:
+                continue
+            seen.add(edge)
+            self._local.edge_alias_list.append(alias)
+            edge_data.append(list(edge) + [self._flatten(props)])
+        key_values = collections.OrderedDict()
+        for label, value in by_key:
+            key_values.setdefault(label, []).append(value)
+        bindings = {"upsertKey": key, "keyValues": key_values,
+                    "vertices": vertex_data, "edges": edge_data}
+        return _UPSERT_TEMPLATE, bindings, "[vs, es];"
+
+    def _flatten(self, props):
+        flat = []
+        for k, v in props.items():
+            flat.extend((k, v))
+        return flat
+
     def _parse_edges(self, edges):
         script = ""
         bindings = {}
@@ -166,42 +481,380 @@ class Graph:
                 bindings[param] = v
             add_edge += ");"
             script += add_edge
-            self._edge_alias_list.append(alias)
+            self._local.edge_alias_list.append(alias)
         return script, bindings
 
 
 class TinkerGraph(GremlinRestClient, Graph):
 
-    def __init__(self, url="http://localhost:8182"):
-        GremlinRestClient.__init__(self, url=url)
-        Graph.__init__(self)
+    def __init__(self, url="http://localhost:8182", templated=False,
+                 columnar=False, lazy=True, flatten=False,
+                 property_ids=False, **kwargs):
+        GremlinRestClient.__init__(self, url=url, **kwargs)
+        Graph.__init__(self, templated=templated, columnar=columnar,
+                       lazy=lazy, flatten=flatten, property_ids=property_ids)
 
     def create(self, *elements):
         script, bindings, alias = Graph.create(self, *elements)
-        script = "%s%s" % (script, alias)
-        return self._create(script, bindings)
+        return self._create(self._finish_script(script, alias), bindings)
+
+    def upsert(self, *elements, key="name"):
+        """
+        Get or create nodes and edges in one request, see
+        :py:meth:`Graph.upsert<gremlinrestclient.graph.Graph.upsert>`.
+
+        :returns: A :py:class:`Collection<gremlinrestclient.graph.Collection>`
+            with every node and edge passed, whether it existed or was
+            created.
+        """
+        script, bindings, alias = Graph.upsert(self, *elements, key=key)
+        return self._create(self._finish_script(script, alias), bindings)
+
+    def scan_vertices(self, label=None, page_size=1000, low=None, high=None):
+        """
+        Iterate over every vertex, or every vertex with ``label``, one page
+        at a time so memory use does not grow with the graph.
+
+        Integer ids are scanned in id windows whose width adapts to how
+        densely the ids are used, aiming at ``page_size`` elements per
+        window. The server only sorts the elements of one window, so its
+        memory use is bounded too. Other ids are paged by sorting all
+        matching elements on every request, which costs server memory in
+        proportion to the graph.
+
+        :param str label: Only scan vertices with this label.
+        :param int page_size: Vertices per request.
+        :param low: Smallest id to include, for scanning part of the graph.
+        :param high: Id to stop before.
+
+        :returns: A generator of
+            :py:class:`Vertex<gremlinrestclient.graph.Vertex>`.
+        """
+        make_vertex = self._factories()[0]
+        for page in self._scan_pages("V", label, page_size, low, high):
+            for vertex in page:
+                yield make_vertex(vertex)
+
+    def scan_edges(self, label=None, page_size=1000, low=None, high=None):
+        """
+        Iterate over every edge, or every edge with ``label``, see
+        :py:meth:`scan_vertices`.
+
+        :returns: A generator of
+            :py:class:`Edge<gremlinrestclient.graph.Edge>`.
+        """
+        make_edge = self._factories()[1]
+        for page in self._scan_pages("E", label, page_size, low, high):
+            for edge in page:
+                yield make_edge(edge)
+
+    def _scan_pages(self, step, label, page_size, low, high):
+        if low is None or high is None:
+            try:
+                first, last = self.id_bounds(edges=step == "E", label=label)
+            except GremlinServerError:
+                # TinkerPop 3.0's min() and max() only accept numbers, so
+                # these ids are paged by sorting
+                first, last = low, None
+            else:
+                if first is None:
+                    return
+            if low is None:
+                low = first
+            if high is None and _is_integer(last):
+                high = last + 1
+        if not (_is_integer(low) and _is_integer(high)):
+            for page in self._sorted_pages(step, label, page_size, low, high):
+                yield page
+            return
+        width = page_size
+        while low < high:
+            window_high = min(low + width, high)
+            count = 0
+            for page in self._sorted_pages(step, label, page_size, low,
+                                           window_high):
+                count += len(page)
+                yield page
+            low = window_high
+            # Aim the next window at page_size elements, growing at most
+            # fourfold so a dense stretch after a sparse one stays small
+            width = max(1, int(width * min(4.0, max(
+                0.5, float(page_size) / max(count, 1)))))
+
+    def _sorted_pages(self, step, label, page_size, low, high):
+        bindings = {_SCAN_LIMIT: page_size}
+        if label is not None:
+            bindings[_SCAN_LABEL] = label
+        if high is not None:
+            bindings[_SCAN_HIGH] = high
+        after = None
+        while True:
+            if after is not None:
+                bindings[_SCAN_FROM] = after
+            elif low is not None:
+                bindings[_SCAN_FROM] = low
+            script = _scan_script(step, label, low, high, after)
+            data = self.execute(script, bindings=bindings).data
+            if data:
+                yield data
+            if len(data) < page_size:
+                return
+            after = data[-1]["id"]
+            if _is_integer(after) and _is_integer(high) and after + 1 >= high:
+                return
+
+    def id_bounds(self, edges=False, label=None):
+        """
+        The smallest and largest vertex, or edge, id. ``(None, None)`` if
+        there are no matching elements.
+        """
+        traversal = "g.%s()" % ("E" if edges else "V")
+        bindings = {}
+        if label is not None:
+            traversal += ".hasLabel(%s)" % _SCAN_LABEL
+            bindings[_SCAN_LABEL] = label
+        script = ("[%s.id().min().tryNext().orElse(null), "
+                  "%s.id().max().tryNext().orElse(null)]" % (
+                      traversal, traversal))
+        low, high = self.execute(script, bindings=bindings).data
+        return low, high
+
+    def bulk_create(self, elements, batch_size=500, max_payload_bytes=None,
+                    max_tracked=100000):
+        """
+        Create nodes and edges from an iterable of any length, submitting
+        them in batches. The iterable is consumed lazily, so it can be a
+        generator.
+
+        :param elements: Iterable of elements accepted by :py:meth:`create`.
+            Edges must reference their nodes directly (positional int
+            references are not supported).
+        :param int batch_size: Maximum number of elements per request.
+        :param int max_payload_bytes: Approximate maximum request size. A
+            batch is submitted early if adding the next element would
+            exceed it.
+        :param int max_tracked: Number of created nodes remembered so that
+            edges in later batches can reference them. Referencing an
+            older node dict raises :py:class:`ValueError`; pass the
+            :py:class:`Vertex<gremlinrestclient.graph.Vertex>` returned by
+            the server instead.
+
+        :returns: A generator yielding one
+            :py:class:`Collection<gremlinrestclient.graph.Collection>` per
+            submitted batch.
+        """
+        resolved = collections.OrderedDict()
+        batch = []
+        batch_bytes = 0
+        for element in elements:
+            size = self._estimate_size(element)
+            if (batch and max_payload_bytes and
+                    batch_bytes + size > max_payload_bytes):
+                yield self._submit_batch(batch, resolved, max_tracked)
+                batch = []
+                batch_bytes = 0
+            # Resolve after any submit so references to the batch just
+            # created point at the server side vertices
+            element = self._resolve_element(element, resolved)
+            if element is None:
+                continue
+            batch.append(element)
+            batch_bytes += size
+            if len(batch) >= batch_size:
+                yield self._submit_batch(batch, resolved, max_tracked)
+                batch = []
+                batch_bytes = 0
+        if batch:
+            yield self._submit_batch(batch, resolved, max_tracked)
+
+    def _resolve_element(self, element, resolved):
+        """
+        Swap nodes created by a previous batch for their server side
+        :py:class:`Vertex<gremlinrestclient.graph.Vertex>`.
+        """
+        if isinstance(element, Vertex):
+            return None  # Already exists on the server
+        elif isinstance(element, dict):
+            _check_tracked(element)
+            if id(element) in resolved:
+                return None
+            return element
+        elif isinstance(element, tuple):
+            source, label, target = element[:3]
+            return (self._resolve_vertex(source, resolved), label,
+                    self._resolve_vertex(target, resolved)) + element[3:4]
+        raise ValueError('%s not supported, use dict for vertices and tuple '
+                         'for edges' % type(element))
+
+    def _resolve_vertex(self, vertex, resolved):
+        if isinstance(vertex, int):
+            raise ValueError('positional vertex references are not '
+                             'supported by bulk_create')
+        if isinstance(vertex, dict):
+            _check_tracked(vertex)
+        ptr = id(vertex)
+        if ptr in resolved:
+            resolved[ptr] = resolved.pop(ptr)  # Mark as recently used
+            return resolved[ptr][1]
+        return vertex
+
+    def _estimate_size(self, element):
+        # 32 bytes roughly covers the script text added per element
+        return len(json.dumps(element, default=repr, skipkeys=True)) + 32
+
+    def _submit_batch(self, batch, resolved, max_tracked):
+        collection = self.create(*batch)
+        vertices = collection.vertices
+        if self._columnar:
+            ids = vertices.ids
+            if not isinstance(ids, list):
+                ids = ids.tolist()
+            vertices = [Vertex(vid, label, {})
+                        for vid, label in zip(ids, vertices.labels)]
+        for vertex_dict, vertex in zip(self._local.new_vertices, vertices):
+            props = vertex_dict["properties"]
+            resolved[id(props)] = (props, vertex)
+        while len(resolved) > max_tracked:
+            _, (props, _) = resolved.popitem(last=False)
+            props[_UNTRACKED] = True
+        return collection
 
     def _create(self, script, bindings):
+        return self._build_collection(
+            self._execute_create(script, bindings).data)
+
+    def _execute_create(self, script, bindings):
+        metrics = CreateMetrics(len(script), len(bindings))
+        self.stats.record_create(metrics)
+        self._fire("create", metrics)
         resp = self.execute(script, bindings=bindings)
-        data = resp.data
-        vertices = tuple(Vertex(v["id"],
-                                v["label"],
-                                v["properties"]) for v in data[0])
-        edges = tuple(Edge(e["id"],
-                           e["outV"],
-                           e["label"],
-                           e["inV"],
-                           e.get("properties", {})) for e in data[1])
-        collection = Collection(vertices, edges)
-        return collection
+        # Cached reads may no longer reflect the graph
+        self.invalidate_cache()
+        return resp
+
+
+def _check_tracked(vertex):
+    if _UNTRACKED in vertex:
+        raise ValueError('a node created by an earlier batch is referenced '
+                         'after bulk_create stopped tracking it, raise '
+                         'max_tracked or reference the returned Vertex')
 
 
 class TitanGraph(TinkerGraph):
 
-    def __init__(self, url="http://localhost:8182"):
-        super(TitanGraph, self).__init__(url=url)
+    def __init__(self, url="http://localhost:8182", **kwargs):
+        super(TitanGraph, self).__init__(url=url, **kwargs)
+        self._batches = threading.local()
 
     def create(self, *elements):
-        script, bindings, alias = Graph.create(self, *elements)
-        script = "%s%s%s" % (script, "graph.tx().commit();", alias)
-        return self._create(script, bindings)
+        batch = getattr(self._batches, "current", None)
+        if batch is not None:
+            return batch.create(*elements)
+        return super(TitanGraph, self).create(*elements)
+
+    def batch(self, commit_every=500):
+        """
+        Combine the creates made in a ``with`` block into fewer requests,
+        committing once per ``commit_every`` elements instead of once per
+        create. Only applies to creates made from the current thread.
+
+        >>> with graph.batch(commit_every=1000) as batch:
+        ...     future = graph.create({"name": "dave"})
+        >>> future.result().vertices
+
+        :param int commit_every: Number of nodes and edges, summed over the
+            create calls, after which the pending creates are sent and
+            committed.
+
+        :returns: A
+            :py:class:`TransactionBatch<gremlinrestclient.graph.TransactionBatch>`.
+        """
+        return TransactionBatch(self, commit_every)
+
+    def _finish_script(self, script, alias):
+        return "%s%s%s" % (script, "graph.tx().commit();", alias)
+
+
+class TransactionBatch(object):
+    """
+    Creates collected by :py:meth:`TitanGraph.batch`. Inside the ``with``
+    block ``create`` returns a :py:class:`concurrent.futures.Future` that
+    resolves to the call's
+    :py:class:`Collection<gremlinrestclient.graph.Collection>` once its
+    transaction is committed. Leaving the block sends the remaining creates,
+    unless the block raised, in which case they are dropped and their
+    futures cancelled. Cancelling a future before its create is sent drops
+    that create.
+
+    A failed transaction is rolled back on the server, its futures get the
+    error, and the error is raised from the create call or block exit that
+    sent it. ``committed`` counts the create calls committed so far, so an
+    interrupted load can tell how far it got.
+
+    Elements can only reference nodes created by the same create call, or
+    :py:class:`Vertex<gremlinrestclient.graph.Vertex>` objects from
+    committed results.
+    """
+
+    def __init__(self, graph, commit_every=500):
+        self._graph = graph
+        self.commit_every = commit_every
+        self.committed = 0
+        self._pending = []
+        self._pending_elements = 0
+
+    def create(self, *elements):
+        graph = self._graph
+        vertices, edges = graph._prepare(elements)
+        _, bindings, _ = graph._parse_templated(vertices, edges)
+        future = futures.Future()
+        create = [bindings["vertices"], bindings.get("edges", [])]
+        self._pending.append((create, future))
+        self._pending_elements += len(create[0]) + len(create[1])
+        if self._pending_elements >= self.commit_every:
+            self.flush()
+        return future
+
+    def flush(self):
+        """Send the pending creates and commit them."""
+        pending, self._pending = self._pending, []
+        self._pending_elements = 0
+        # Creates whose future was cancelled are not sent
+        pending = [(create, future) for create, future in pending
+                   if future.set_running_or_notify_cancel()]
+        if not pending:
+            return
+        creates = [create for create, _ in pending]
+        try:
+            resp = self._graph._execute_create(_BATCH_TEMPLATE,
+                                               {"creates": creates})
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            raise
+        results = resp.data
+        for (_, future), data in zip(pending, results):
+            future.set_result(self._graph._build_collection(data))
+        self.committed += min(len(pending), len(results))
+        if len(results) != len(pending):
+            error = RuntimeError("Batch of %d creates returned %d results" %
+                                 (len(pending), len(results)))
+            for _, future in pending[len(results):]:
+                future.set_exception(error)
+            raise error
+
+    def __enter__(self):
+        if getattr(self._graph._batches, "current", None) is not None:
+            raise RuntimeError("Batches can not be nested")
+        self._graph._batches.current = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._graph._batches.current = None
+        if exc_type is not None:
+            for _, future in self._pending:
+                future.cancel()
+            self._pending = []
+            self._pending_elements = 0
+            return False
+        self.flush()
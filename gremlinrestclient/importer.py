@@ -0,0 +1,373 @@
+"""
+Stream nodes and edges from CSV or JSON lines files into the graph.
+
+Run as a console script::
+
+    $ gremlinrestclient-import people.csv --label person --key name
+    $ gremlinrestclient-import knows.jsonl --edges --label KNOWS \\
+          --source-column from --target-column to --key name \\
+          --checkpoint knows.checkpoint
+"""
+import argparse
+import collections
+import csv
+import json
+import os
+import sys
+import time
+from concurrent import futures
+
+from gremlinrestclient.graph import Graph, TinkerGraph, TitanGraph
+
+
+__all__ = ("ImportMapping", "Importer", "read_records")
+
+
+FORMATS = ("csv", "jsonl")
+
+
+def _parse_bool(value):
+    return value.strip().lower() in ("1", "true", "yes", "y")
+
+
+# Converters for CSV columns, by the names accepted on the command line
+TYPES = {"int": int, "float": float, "bool": _parse_bool, "str": str}
+
+
+def read_records(path, format=None, offset=0):
+    """
+    Stream the records of a CSV or JSON lines file without reading it into
+    memory. CSV files need a header row, and their fields can not contain
+    line breaks.
+
+    :param str path: File to read.
+    :param str format: "csv" or "jsonl", guessed from the file extension by
+        default.
+    :param int offset: Byte offset to start reading from, as yielded by an
+        earlier call.
+
+    :returns: A generator of ``(offset, record)`` pairs, where ``record`` is
+        a dict and ``offset`` the byte offset just after it.
+    """
+    format = format or _guess_format(path)
+    with open(path, "rb") as f:
+        header = None
+        if format == "csv":
+            header = next(csv.reader([f.readline().decode("utf-8-sig")]))
+        if offset > f.tell():
+            f.seek(offset)
+        while True:
+            line = f.readline()
+            if not line:
+                break
+            text = line.decode("utf-8").rstrip("\r\n")
+            if not text.strip():
+                continue
+            if header is not None:
+                record = dict(zip(header, next(csv.reader([text]))))
+            else:
+                record = json.loads(text)
+            yield f.tell(), record
+
+
+def _guess_format(path):
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext in ("json", "jsonl", "ndjson"):
+        return "jsonl"
+    if ext in ("csv", "txt"):
+        return "csv"
+    raise ValueError("Can not guess the format of %s, pass csv or jsonl"
+                     % path)
+
+
+class ImportMapping(object):
+    """
+    How file records become elements for
+    :py:meth:`Graph.create<gremlinrestclient.graph.Graph.create>`.
+
+    :param str kind: "vertex" or "edge".
+    :param str label: Label of every element.
+    :param str label_column: Column holding the label, used instead of
+        ``label`` where it is set.
+    :param properties: Columns stored as properties, either a list or a dict
+        mapping a column to a property key. Defaults to every column not
+        used otherwise. Empty values are skipped.
+    :param dict types: Maps a column to a callable that converts its value,
+        for CSV files where every value is a string.
+    :param str key: Property that identifies a node. If set, nodes are
+        upserted on it instead of created, which makes resuming an
+        interrupted import safe. Edge imports require it: edge endpoints are
+        nodes upserted on ``key``.
+    :param str source_column: Column holding the key of an edge's source.
+    :param str target_column: Column holding the key of an edge's target.
+    :param str source_label: Label for sources the import creates.
+    :param str target_label: Label for targets the import creates.
+    """
+
+    KINDS = ("vertex", "edge")
+
+    def __init__(self, kind="vertex", label=None, label_column=None,
+                 properties=None, types=None, key=None, source_column=None,
+                 target_column=None, source_label=None, target_label=None):
+        if kind not in self.KINDS:
+            raise ValueError("Unknown kind %s" % kind)
+        if kind == "edge" and not (key and source_column and target_column):
+            raise ValueError("Edge imports need key, source_column and "
+                             "target_column")
+        if kind == "edge" and not (label or label_column):
+            raise ValueError("Edge imports need label or label_column")
+        self.kind = kind
+        self.label = label
+        self.label_column = label_column
+        if properties is not None and not isinstance(properties, dict):
+            properties = dict((column, column) for column in properties)
+        self.properties = properties
+        self.types = types or {}
+        self.key = key
+        self.source_column = source_column
+        self.target_column = target_column
+        self.source_label = source_label
+        self.target_label = target_label
+        self._used = set(column for column in (label_column, source_column,
+                                               target_column) if column)
+
+    def element(self, record):
+        """The vertex dict or edge tuple for ``record``."""
+        label = record.get(self.label_column) or self.label
+        props = self._properties(record)
+        if self.kind == "vertex":
+            if label:
+                props["label"] = label
+            return props
+        source = self._endpoint(record, self.source_column, self.source_label)
+        target = self._endpoint(record, self.target_column, self.target_label)
+        return (source, label, target, props)
+
+    def _properties(self, record):
+        columns = self.properties
+        if columns is None:
+            columns = dict((column, column) for column in record
+                           if column not in self._used)
+        props = {}
+        for column, key in columns.items():
+            value = record.get(column)
+            if value is None or value == "":
+                continue
+            props[key] = self._convert(column, value)
+        return props
+
+    def _endpoint(self, record, column, label):
+        vertex = {self.key: self._convert(column, record[column])}
+        if label:
+            vertex["label"] = label
+        return vertex
+
+    def _convert(self, column, value):
+        convert = self.types.get(column)
+        if convert is not None:
+            return convert(value)
+        return value
+
+
+class Importer(object):
+    """
+    Load a file into the graph in batches sent over a pool of worker
+    threads. Scripts are built in the calling thread, so one graph object
+    can be shared by all workers.
+
+    With a checkpoint file, the byte offset after the last batch known to be
+    stored (along with every batch before it) is saved as the import
+    progresses, and a later run over the same file resumes from there.
+    Batches that were in flight when an import stopped are sent again, so
+    use a mapping with a ``key`` to avoid duplicates.
+
+    :param graph: A :py:class:`TinkerGraph<gremlinrestclient.graph.TinkerGraph>`
+        or :py:class:`TitanGraph<gremlinrestclient.graph.TitanGraph>`.
+    :param mapping: An
+        :py:class:`ImportMapping<gremlinrestclient.importer.ImportMapping>`.
+    :param int batch_size: Records per request.
+    :param int workers: Requests in flight.
+    :param str checkpoint: File to save progress to and resume from.
+    :param progress: Called with the number of records imported by this
+        run, the current byte offset and the elapsed seconds.
+    :param float progress_interval: Minimum seconds between progress calls.
+    """
+
+    def __init__(self, graph, mapping, batch_size=500, workers=4,
+                 checkpoint=None, progress=None, progress_interval=1.0):
+        self.graph = graph
+        self.mapping = mapping
+        self.batch_size = batch_size
+        self.workers = workers
+        self.checkpoint = checkpoint
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.records = 0
+        self.offset = 0
+
+    def run(self, path, format=None):
+        """
+        Import ``path``.
+
+        :returns: The number of records imported by this call.
+        """
+        self.offset, self.records = self._load_checkpoint(path)
+        start_records = self.records
+        started = last_report = time.time()
+        # (future, offset after the batch, records in the batch)
+        pending = collections.deque()
+        executor = futures.ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            for offset, batch in self._batches(
+                    read_records(path, format, self.offset)):
+                script, bindings = self._build(batch)
+                future = executor.submit(self.graph._create, script,
+                                         bindings)
+                pending.append((future, offset, len(batch)))
+                # Keep the workers busy without reading ahead unboundedly
+                while pending and (len(pending) >= self.workers * 2 or
+                                   pending[0][0].done()):
+                    self._finish(path, *pending.popleft())
+                    if (self.progress is not None and
+                            time.time() - last_report >=
+                            self.progress_interval):
+                        last_report = time.time()
+                        self.progress(self.records - start_records,
+                                      self.offset, last_report - started)
+            while pending:
+                self._finish(path, *pending.popleft())
+        finally:
+            for future, _, _ in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+        if self.progress is not None:
+            self.progress(self.records - start_records, self.offset,
+                          time.time() - started)
+        return self.records - start_records
+
+    def _batches(self, records):
+        batch = []
+        offset = None
+        for offset, record in records:
+            batch.append(self.mapping.element(record))
+            if len(batch) >= self.batch_size:
+                yield offset, batch
+                batch = []
+        if batch:
+            yield offset, batch
+
+    def _build(self, batch):
+        graph = self.graph
+        if self.mapping.key:
+            script, bindings, alias = Graph.upsert(graph, *batch,
+                                                   key=self.mapping.key)
+        else:
+            script, bindings, alias = Graph.create(graph, *batch)
+        return graph._finish_script(script, alias), bindings
+
+    def _finish(self, path, future, offset, count):
+        future.result()
+        self.records += count
+        self.offset = offset
+        if self.checkpoint:
+            self._save_checkpoint(path)
+
+    def _load_checkpoint(self, path):
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return 0, 0
+        with open(self.checkpoint) as f:
+            state = json.load(f)
+        if state["path"] != os.path.abspath(path):
+            raise ValueError("Checkpoint %s belongs to %s" % (
+                self.checkpoint, state["path"]))
+        return state["offset"], state["records"]
+
+    def _save_checkpoint(self, path):
+        tmp = self.checkpoint + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"path": os.path.abspath(path), "offset": self.offset,
+                       "records": self.records}, f)
+        os.replace(tmp, self.checkpoint)
+
+
+def _pairs(values, convert=None):
+    pairs = {}
+    for value in values or ():
+        column, _, other = value.partition("=")
+        other = other or column
+        pairs[column] = convert(other) if convert else other
+    return pairs
+
+
+def _type(name):
+    try:
+        return TYPES[name]
+    except KeyError:
+        raise argparse.ArgumentTypeError(
+            "unknown type %s, use one of %s" % (name, ", ".join(TYPES)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("path", help="CSV or JSON lines file")
+    parser.add_argument("--format", choices=FORMATS,
+                        help="file format, guessed from the extension")
+    parser.add_argument("--url", action="append",
+                        help="Gremlin Server url, repeat to balance over "
+                             "several (default http://localhost:8182)")
+    parser.add_argument("--titan", action="store_true",
+                        help="commit every batch, for Titan")
+    parser.add_argument("--edges", action="store_true",
+                        help="records are edges instead of nodes")
+    parser.add_argument("--label", help="label of every element")
+    parser.add_argument("--label-column", help="column holding the label")
+    parser.add_argument("--property", action="append", metavar="COLUMN[=KEY]",
+                        help="column to store, repeatable (default all)")
+    parser.add_argument("--type", action="append", metavar="COLUMN=TYPE",
+                        help="convert a column: %s" % ", ".join(TYPES))
+    parser.add_argument("--key", help="property to upsert nodes on")
+    parser.add_argument("--source-column", help="edge source key column")
+    parser.add_argument("--target-column", help="edge target key column")
+    parser.add_argument("--source-label", help="label of created sources")
+    parser.add_argument("--target-label", help="label of created targets")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--checkpoint",
+                        help="file to save progress to and resume from")
+    args = parser.parse_args(argv)
+
+    try:
+        mapping = ImportMapping(
+            kind="edge" if args.edges else "vertex", label=args.label,
+            label_column=args.label_column,
+            properties=_pairs(args.property) or None,
+            types=_pairs(args.type, _type), key=args.key,
+            source_column=args.source_column,
+            target_column=args.target_column,
+            source_label=args.source_label, target_label=args.target_label)
+    except (ValueError, argparse.ArgumentTypeError) as e:
+        parser.error(str(e))
+    urls = args.url or ["http://localhost:8182"]
+    url = urls[0] if len(urls) == 1 else urls
+    graph_class = TitanGraph if args.titan else TinkerGraph
+    graph = graph_class(url, templated=True, pool_maxsize=args.workers)
+    size = os.path.getsize(args.path)
+
+    def progress(records, offset, elapsed):
+        sys.stderr.write("\r%d records, %.0f records/s, %.1f%%" % (
+            records, records / elapsed if elapsed else 0,
+            100.0 * offset / size if size else 100))
+        sys.stderr.flush()
+
+    importer = Importer(graph, mapping, batch_size=args.batch_size,
+                        workers=args.workers, checkpoint=args.checkpoint,
+                        progress=progress)
+    with graph:
+        count = importer.run(args.path, args.format)
+    sys.stderr.write("\nImported %d records\n" % count)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
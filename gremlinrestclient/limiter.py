@@ -0,0 +1,157 @@
+"""Adaptive limits on the number of requests in flight."""
+import math
+import threading
+import time
+
+from gremlinrestclient.balancer import is_unhealthy
+
+
+__all__ = ("ConcurrencyLimiter", "AIMDLimiter", "GradientLimiter")
+
+
+class ConcurrencyLimiter(object):
+    """
+    Block requests while ``limit`` requests are in flight, and adjust the
+    limit from the latency and outcome of every finished request.
+    Subclasses decide how the limit moves by overriding ``_update``; use
+    :py:class:`AIMDLimiter` or :py:class:`GradientLimiter`.
+
+    :param int initial_limit: Limit to start with.
+    :param int min_limit: The limit never drops below this.
+    :param int max_limit: The limit never grows above this.
+    """
+
+    def __init__(self, initial_limit=10, min_limit=1, max_limit=1000,
+                 clock=time.time):
+        if type(self)._update is ConcurrencyLimiter._update:
+            raise TypeError("%s does not define how the limit moves, use "
+                            "AIMDLimiter or GradientLimiter" %
+                            type(self).__name__)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self._clock = clock
+        self._limit = float(initial_limit)
+        self._cond = threading.Condition()
+        self.in_flight = 0
+
+    @property
+    def limit(self):
+        """The current limit."""
+        return int(self._limit)
+
+    def acquire(self):
+        """Wait for a free slot. Must be paired with :py:meth:`release`."""
+        with self._cond:
+            while self.in_flight >= int(self._limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, latency, error=None):
+        """
+        Report a finished request.
+
+        :param float latency: Seconds the request took.
+        :param error: The exception it raised, if any. Errors that point at
+            an overloaded server, such as 500, 503 and 598 responses, and
+            connection errors, lower the limit.
+        """
+        with self._cond:
+            overloaded = is_unhealthy(error)
+            limit = self._update(latency, overloaded, self.in_flight)
+            self._limit = max(self.min_limit, min(self.max_limit, limit))
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def _update(self, latency, overloaded, in_flight):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return "%s(limit=%s, in_flight=%s)" % (
+            type(self).__name__, self.limit, self.in_flight)
+
+
+class AIMDLimiter(ConcurrencyLimiter):
+    """
+    Additive increase, multiplicative decrease. Every successful request
+    made while at least half the limit is in use raises the limit by
+    ``increase`` divided by the limit, about ``increase`` per round of
+    requests. An overload, or a request slower than ``latency_threshold``,
+    multiplies it by ``backoff``. The requests that were already in flight
+    when the limit dropped do not lower it again.
+
+    :param float increase: Limit gained per round of successful requests.
+    :param float backoff: Factor applied to the limit on overload.
+    :param float latency_threshold: Seconds after which a request counts as
+        an overload, ``None`` to only react to errors.
+    """
+
+    def __init__(self, initial_limit=10, min_limit=1, max_limit=1000,
+                 increase=1.0, backoff=0.9, latency_threshold=None,
+                 clock=time.time):
+        super(AIMDLimiter, self).__init__(initial_limit, min_limit,
+                                          max_limit, clock)
+        self.increase = increase
+        self.backoff = backoff
+        self.latency_threshold = latency_threshold
+        self._dropped_at = None
+
+    def _update(self, latency, overloaded, in_flight):
+        if (self.latency_threshold is not None and
+                latency > self.latency_threshold):
+            overloaded = True
+        now = self._clock()
+        if overloaded:
+            started = now - latency
+            if self._dropped_at is not None and started < self._dropped_at:
+                return self._limit
+            self._dropped_at = now
+            return self._limit * self.backoff
+        if in_flight * 2 >= self._limit:
+            return self._limit + self.increase / self._limit
+        return self._limit
+
+
+class GradientLimiter(ConcurrencyLimiter):
+    """
+    Follow the ratio of the lowest latency seen recently to the current
+    latency. While requests are as fast as the server gets unloaded, the
+    limit grows by a queue allowance of ``sqrt(limit)``; as latency rises
+    the limit shrinks in proportion. Overloads halve the gradient.
+
+    :param float smoothing: Weight of each new estimate of the limit.
+    :param int window: Requests after which the lowest latency is
+        forgotten, so a permanently slower server is not mistaken for an
+        overloaded one.
+    :param float tolerance: Latency may exceed the lowest one by this factor
+        before the limit shrinks.
+    """
+
+    def __init__(self, initial_limit=10, min_limit=1, max_limit=1000,
+                 smoothing=0.2, window=500, tolerance=1.5, clock=time.time):
+        super(GradientLimiter, self).__init__(initial_limit, min_limit,
+                                              max_limit, clock)
+        self.smoothing = smoothing
+        self.window = window
+        self.tolerance = tolerance
+        self._min_latency = None
+        self._samples = 0
+
+    def _update(self, latency, overloaded, in_flight):
+        self._samples += 1
+        if self._samples > self.window:
+            self._samples = 1
+            self._min_latency = None
+        if self._min_latency is None or latency < self._min_latency:
+            self._min_latency = latency
+        if latency > 0:
+            gradient = self.tolerance * self._min_latency / latency
+        else:
+            gradient = 1.0
+        gradient = max(0.5, min(1.0, gradient))
+        if overloaded:
+            gradient = 0.5
+        target = self._limit * gradient + math.sqrt(self._limit)
+        if in_flight * 2 < self._limit:
+            # Not enough traffic to learn anything about a higher limit
+            target = min(target, self._limit)
+        return self._limit + self.smoothing * (target - self._limit)
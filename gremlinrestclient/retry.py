@@ -0,0 +1,160 @@
+"""Retry and request hedging policies for idempotent requests."""
+import random
+import threading
+import time
+from concurrent import futures
+
+import requests
+
+from gremlinrestclient.exceptions import StatusException
+
+
+__all__ = ("RetryPolicy", "RetryBudget", "HedgePolicy")
+
+
+class RetryBudget(object):
+    """
+    Limit retries to a fraction of requests, so retries cannot multiply the
+    load on an overloaded server. Every request deposits ``ratio`` tokens
+    and every retry spends one.
+
+    :param float ratio: Retries allowed per request, on average.
+    :param int reserve: Tokens available up front, so the first failures
+        can be retried.
+    :param int max_tokens: Cap on saved up tokens.
+    """
+
+    def __init__(self, ratio=0.2, reserve=10, max_tokens=100):
+        self._ratio = ratio
+        self._max_tokens = max_tokens
+        self._tokens = float(reserve)
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self):
+        return self._tokens
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self._max_tokens, self._tokens + self._ratio)
+
+    def withdraw(self):
+        """Spend a token, returns ``False`` when the budget is exhausted."""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class RetryPolicy(object):
+    """
+    Retry failed requests with exponential backoff and jitter.
+
+    :param int max_attempts: Total attempts, including the first one.
+    :param float backoff: Delay before the first retry, in seconds. It
+        doubles with every further retry.
+    :param float max_backoff: Upper limit on the delay.
+    :param float jitter: Fraction of the delay that is randomized, 1 for
+        "full jitter".
+    :param retry_on: Status codes to retry. Either an iterable of codes, or
+        a dict mapping a code to the maximum attempts for that code.
+    :param bool retry_connection_errors: Also retry connection errors and
+        client side timeouts.
+    :param budget: Optional shared
+        :py:class:`RetryBudget<gremlinrestclient.retry.RetryBudget>`.
+    """
+
+    def __init__(self, max_attempts=3, backoff=0.1, max_backoff=10.0,
+                 jitter=1.0, retry_on=(500, 598), retry_connection_errors=True,
+                 budget=None, sleep=time.sleep):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        if not isinstance(retry_on, dict):
+            retry_on = dict((code, max_attempts) for code in retry_on)
+        self.retry_on = retry_on
+        self.retry_connection_errors = retry_connection_errors
+        self.budget = budget
+        self._sleep = sleep
+
+    def should_retry(self, error, attempt):
+        """Whether to retry after ``attempt`` attempts failed with ``error``."""
+        if isinstance(error, StatusException):
+            return attempt < self.retry_on.get(error.value, 0)
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return (self.retry_connection_errors and
+                    attempt < self.max_attempts)
+        return False
+
+    def delay(self, attempt):
+        """Seconds to wait before the retry following ``attempt``."""
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return delay * (1 - self.jitter * random.random())
+
+    def call(self, func):
+        """Call ``func`` until it succeeds or the policy gives up."""
+        if self.budget is not None:
+            self.budget.deposit()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return func()
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                if self.budget is not None and not self.budget.withdraw():
+                    raise
+            self._sleep(self.delay(attempt))
+
+
+class HedgePolicy(object):
+    """
+    Send a duplicate request when the first one is slower than usual and
+    use whichever response comes first.
+
+    :param float percentile: Hedge after the client's observed latency at
+        this percentile.
+    :param float delay: Hedge delay, in seconds, until ``min_samples``
+        requests have been observed.
+    :param int min_samples: Observations needed before the percentile is
+        used.
+    :param int max_hedges: Maximum number of duplicate requests.
+    """
+
+    def __init__(self, percentile=95, delay=0.05, min_samples=20,
+                 max_hedges=1):
+        self.percentile = percentile
+        self.delay = delay
+        self.min_samples = min_samples
+        self.max_hedges = max_hedges
+
+    def hedge_delay(self, histogram):
+        if histogram is not None and histogram.count >= self.min_samples:
+            return histogram.percentile(self.percentile)
+        return self.delay
+
+    def call(self, func, executor, histogram=None):
+        """
+        Call ``func`` on ``executor``, hedging based on the latencies in
+        ``histogram``.
+        """
+        delay = self.hedge_delay(histogram)
+        pending = set([executor.submit(func)])
+        hedges = 0
+        error = None
+        while pending:
+            timeout = delay if hedges < self.max_hedges else None
+            done, pending = futures.wait(
+                pending, timeout=timeout,
+                return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+            if not done:
+                pending.add(executor.submit(func))
+                hedges += 1
+        raise error
@@ -0,0 +1,128 @@
+"""JSON serializers used to encode requests and decode responses."""
+import json
+
+
+__all__ = ("JSONSerializer", "OrjsonSerializer", "UjsonSerializer",
+           "RapidjsonSerializer", "get_serializer")
+
+
+class JSONSerializer(object):
+    """
+    Standard library serializer, always available. Subclasses wrap faster
+    third party libraries. ``dumps`` returns :py:class:`bytes` ready to be
+    sent and ``loads`` accepts the raw response body.
+
+    The subclasses take a ``decode`` flag. When it is false only requests
+    are encoded with the faster library and responses are decoded with the
+    standard library, which keeps integers of any size exact.
+    """
+
+    name = "json"
+
+    def dumps(self, obj):
+        return json.dumps(obj).encode("utf-8")
+
+    def loads(self, data):
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        return json.loads(data)
+
+
+class OrjsonSerializer(JSONSerializer):
+    """
+    Encodes non string keys like the standard library does, and falls back
+    to it for values orjson rejects, such as integers above 64 bits.
+    """
+
+    name = "orjson"
+
+    def __init__(self, decode=True):
+        import orjson
+        self._orjson = orjson
+        self.decode = decode
+
+    def dumps(self, obj):
+        try:
+            return self._orjson.dumps(obj,
+                                      option=self._orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            return super(OrjsonSerializer, self).dumps(obj)
+
+    def loads(self, data):
+        if not self.decode:
+            return super(OrjsonSerializer, self).loads(data)
+        return self._orjson.loads(data)
+
+
+class UjsonSerializer(JSONSerializer):
+
+    name = "ujson"
+
+    def __init__(self, decode=True):
+        import ujson
+        self._ujson = ujson
+        self.decode = decode
+
+    def dumps(self, obj):
+        try:
+            return self._ujson.dumps(obj).encode("utf-8")
+        except OverflowError:
+            return super(UjsonSerializer, self).dumps(obj)
+
+    def loads(self, data):
+        if not self.decode:
+            return super(UjsonSerializer, self).loads(data)
+        return self._ujson.loads(data)
+
+
+class RapidjsonSerializer(JSONSerializer):
+
+    name = "rapidjson"
+
+    def __init__(self, decode=True):
+        import rapidjson
+        self._rapidjson = rapidjson
+        self.decode = decode
+
+    def dumps(self, obj):
+        try:
+            return self._rapidjson.dumps(obj).encode("utf-8")
+        except (TypeError, ValueError, OverflowError):
+            # Non string keys, NaN and infinity
+            return super(RapidjsonSerializer, self).dumps(obj)
+
+    def loads(self, data):
+        if not self.decode:
+            return super(RapidjsonSerializer, self).loads(data)
+        return self._rapidjson.loads(data)
+
+
+# Fastest first
+_SERIALIZERS = (OrjsonSerializer, UjsonSerializer, RapidjsonSerializer,
+                JSONSerializer)
+
+
+def get_serializer(serializer=None):
+    """
+    Resolve a serializer.
+
+    :param serializer: ``None`` encodes requests with the fastest installed
+        library and decodes responses with the standard library, a string
+        selects a library for both by name ("orjson", "ujson", "rapidjson"
+        or "json") and a serializer instance is returned unchanged.
+
+    :returns: :py:class:`JSONSerializer<gremlinrestclient.serializer.JSONSerializer>`
+    """
+    if serializer is None:
+        for cls in _SERIALIZERS[:-1]:
+            try:
+                return cls(decode=False)
+            except ImportError:
+                continue
+        return JSONSerializer()
+    if isinstance(serializer, str):
+        for cls in _SERIALIZERS:
+            if cls.name == serializer:
+                return cls()
+        raise ValueError("Unknown serializer %s" % serializer)
+    return serializer
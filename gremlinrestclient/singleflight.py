@@ -0,0 +1,78 @@
+"""Coalescing of identical concurrent requests."""
+import asyncio
+import threading
+from concurrent import futures
+
+
+__all__ = ("SingleFlight", "AsyncSingleFlight")
+
+
+class SingleFlight(object):
+    """
+    Run at most one call per key at a time. Threads asking for a key that
+    is already in flight wait for that call and share its result or
+    exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0
+
+    def do(self, key, func):
+        """Call ``func``, unless a call for ``key`` is in flight."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = futures.Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def __len__(self):
+        return len(self._calls)
+
+
+class AsyncSingleFlight(object):
+    """
+    Coroutine counterpart of
+    :py:class:`SingleFlight<gremlinrestclient.singleflight.SingleFlight>`.
+    The shared call runs as a task, so cancelling one waiter does not
+    cancel it for the others.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.shared = 0
+
+    async def do(self, key, func):
+        """Await ``func()``, unless a call for ``key`` is in flight."""
+        task = self._calls.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            task = self._calls[key] = asyncio.ensure_future(func())
+            task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key, task):
+        del self._calls[key]
+        if not task.cancelled():
+            # Retrieved here in case every waiter was cancelled
+            task.exception()
+
+    def __len__(self):
+        return len(self._calls)
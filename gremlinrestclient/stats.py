@@ -0,0 +1,174 @@
+"""Request timing and size metrics collected by the client."""
+import bisect
+import collections
+import threading
+
+
+__all__ = ("Histogram", "ClientStats", "RequestMetrics", "CreateMetrics")
+
+
+# Seconds, from half a millisecond to a minute
+LATENCY_BOUNDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                  0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Bytes or counts, powers of 4 up to 1 GiB
+SIZE_BOUNDS = tuple(4 ** i for i in range(16))
+
+
+CreateMetrics = collections.namedtuple(
+    "CreateMetrics",
+    ["script_length", "binding_count"])
+
+
+class RequestMetrics(object):
+    """
+    Measurements for one request, passed to the ``before_request`` and
+    ``after_request`` hooks. Before the request only ``gremlin``,
+    ``request_bytes`` and ``encode_seconds`` are set.
+
+    ``wait_seconds`` runs from sending the request until the response
+    headers arrive, so it includes server side evaluation.
+    ``network_seconds`` additionally includes reading the body.
+    """
+
+    __slots__ = ("gremlin", "request_bytes", "response_bytes",
+                 "status_code", "result_count", "encode_seconds",
+                 "wait_seconds", "network_seconds", "decode_seconds",
+                 "total_seconds", "error")
+
+    def __init__(self, gremlin):
+        self.gremlin = gremlin
+        self.request_bytes = None
+        self.response_bytes = None
+        self.status_code = None
+        self.result_count = None
+        self.encode_seconds = None
+        self.wait_seconds = None
+        self.network_seconds = None
+        self.decode_seconds = None
+        self.total_seconds = None
+        self.error = None
+
+
+class Histogram(object):
+    """
+    A thread safe histogram with fixed bucket upper bounds, in the style of
+    Prometheus.
+
+    :param bounds: Sorted bucket upper bounds. Larger values are counted in
+        an overflow bucket.
+    """
+
+    def __init__(self, bounds=LATENCY_BOUNDS):
+        self.bounds = tuple(bounds)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(self.bounds) + 1)
+            self.count = 0
+            self.sum = 0
+            self.min = None
+            self.max = None
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.sum += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    def percentile(self, pct):
+        """Upper bound of the bucket holding the ``pct`` percentile."""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = pct / 100.0 * self.count
+            seen = 0
+            for bound, count in zip(self.bounds, self.counts):
+                seen += count
+                if seen >= rank:
+                    return min(bound, self.max)
+            return self.max
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "count": self.count,
+                "sum": self.sum,
+                "min": self.min,
+                "max": self.max,
+                "buckets": list(zip(self.bounds + (float("inf"),),
+                                    self.counts))
+            }
+
+
+class ClientStats(object):
+    """
+    Aggregated metrics for every request made by a client, available as
+    ``client.stats``. ``gauges`` maps names to callables returning a
+    current value, such as the limit of a concurrency limiter; they are
+    read when a snapshot is taken.
+    """
+
+    TIMINGS = ("encode_seconds", "wait_seconds", "network_seconds",
+               "decode_seconds", "total_seconds")
+    SIZES = ("request_bytes", "response_bytes", "result_count")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.gauges = {}
+        self.histograms = {}
+        for name in self.TIMINGS:
+            self.histograms[name] = Histogram(LATENCY_BOUNDS)
+        for name in self.SIZES + ("create_script_length",
+                                  "create_binding_count"):
+            self.histograms[name] = Histogram(SIZE_BOUNDS)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.errors = 0
+            self.status_codes = collections.Counter()
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    def record(self, metrics):
+        """Add a finished :py:class:`RequestMetrics`."""
+        with self._lock:
+            self.requests += 1
+            if metrics.error is not None:
+                self.errors += 1
+            if metrics.status_code is not None:
+                self.status_codes[metrics.status_code] += 1
+        for name in self.TIMINGS + self.SIZES:
+            value = getattr(metrics, name)
+            if value is not None:
+                self.histograms[name].observe(value)
+
+    def record_create(self, metrics):
+        """Add a :py:class:`CreateMetrics`."""
+        self.histograms["create_script_length"].observe(
+            metrics.script_length)
+        self.histograms["create_binding_count"].observe(
+            metrics.binding_count)
+
+    def snapshot(self):
+        """All counters and histograms as plain data, for exporters."""
+        with self._lock:
+            snapshot = {
+                "requests": self.requests,
+                "errors": self.errors,
+                "status_codes": dict(self.status_codes)
+            }
+        snapshot["gauges"] = dict(
+            (name, gauge()) for name, gauge in self.gauges.items())
+        snapshot["histograms"] = dict(
+            (name, histogram.snapshot())
+            for name, histogram in self.histograms.items())
+        return snapshot
@@ -0,0 +1,148 @@
+"""Incremental parsing of Gremlin Server responses."""
+import codecs
+import json
+
+
+__all__ = ("ResponseStream",)
+
+
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",:]}"
+
+
+class ResponseStream(object):
+    """
+    Iterate over the ``result.data`` items of a response body as they are
+    read off the socket, without holding the whole body in memory. The
+    status and meta fields are available once iteration has finished.
+
+    :param response: A streaming :py:class:`requests.Response`.
+    :param int chunk_size: Number of bytes to read at a time.
+    """
+
+    def __init__(self, response, chunk_size=65536):
+        self._response = response
+        self._chunks = response.iter_content(chunk_size)
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._started = False
+        self.status_code = None
+        self.message = None
+        self.metadata = None
+
+    def __iter__(self):
+        if self._started:
+            raise RuntimeError("ResponseStream can only be iterated once")
+        self._started = True
+        try:
+            for item in self._parse():
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        """Release the connection back to the pool."""
+        self._response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _fill(self):
+        if self._eof:
+            return False
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._buf += self._text.decode(b"", final=True)
+            self._eof = True
+            return False
+        # Drop what has been parsed so the buffer stays small
+        self._buf = self._buf[self._pos:] + self._text.decode(chunk)
+        self._pos = 0
+        return True
+
+    def _peek(self):
+        """Next non whitespace character, or ``None`` at the end."""
+        while True:
+            buf = self._buf
+            while self._pos < len(buf) and buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(buf):
+                return buf[self._pos]
+            if not self._fill():
+                return None
+
+    def _expect(self, chars):
+        char = self._peek()
+        if char is None or char not in chars:
+            raise ValueError("Malformed response: expected %r at %r" % (
+                chars, self._buf[self._pos:self._pos + 20]))
+        self._pos += 1
+        return char
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except ValueError:
+                if not self._fill():
+                    raise
+                continue
+            # A number cut off by the end of a chunk still decodes, so only
+            # accept values followed by a delimiter
+            if ((end >= len(self._buf) or
+                    self._buf[end] not in _DELIMITERS) and self._fill()):
+                continue
+            self._pos = end
+            return value
+
+    def _parse(self):
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key == "result":
+                for item in self._parse_result():
+                    yield item
+            elif key == "status":
+                status = self._value()
+                self.status_code = status.get("code")
+                self.message = status.get("message")
+            else:
+                self._value()
+            if self._expect(",}") == "}":
+                return
+
+    def _parse_result(self):
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key == "data" and self._peek() == "[":
+                self._pos += 1
+                if self._peek() == "]":
+                    self._pos += 1
+                else:
+                    while True:
+                        yield self._value()
+                        if self._expect(",]") == "]":
+                            break
+            elif key == "meta":
+                self.metadata = self._value()
+            else:
+                self._value()
+            if self._expect(",}") == "}":
+                return
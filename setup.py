@@ -14,6 +14,14 @@ setup(
     install_requires=[
         "requests>=2.7.0"
     ],
+    extras_require={
+        "aio": ["aiohttp>=3.0"]
+    },
+    entry_points={
+        "console_scripts": [
+            "gremlinrestclient-import = gremlinrestclient.importer:main"
+        ]
+    },
     test_suite="tests",
     classifiers=[
         'Development Status :: 3 - Alpha',
@@ -1,6 +1,30 @@
+import asyncio
+import gzip
+import json
+import os
+import re
+import tempfile
+import time
 import unittest
-from gremlinrestclient import (GremlinRestClient, GremlinServerError,
-                               TinkerGraph, TitanGraph)
+from concurrent import futures
+from gremlinrestclient import (AIMDLimiter, CircuitBreaker,
+                               ColumnarCollection, ConcurrencyLimiter,
+                               EndpointUnavailableError, GremlinRestClient,
+                               LazyElements, LoadBalancer, MicroBatcher,
+                               GremlinServerError, HedgePolicy, RequestError,
+                               RetryBudget, RetryPolicy, GradientLimiter,
+                               Graph, TinkerGraph, TitanGraph, JSONSerializer,
+                               Histogram, ImportMapping, Importer,
+                               RapidjsonSerializer, Response, ResponseStream,
+                               ResultCache,
+                               SingleFlight, AsyncSingleFlight, Vertex,
+                               VertexProperty, export_jsonl, get_serializer,
+                               read_records, split_range)
+try:
+    from gremlinrestclient.aio import AsyncGremlinRestClient, AsyncTinkerGraph
+    import aiohttp
+except ImportError:
+    aiohttp = None
 
 
 class GremlinRestClientTestCase(unittest.TestCase):
@@ -24,6 +48,616 @@ class GremlinRestClientTestCase(unittest.TestCase):
             error = True
         self.assertTrue(error)
 
+    def test_session_reuse(self):
+        session = self.client.session
+        self.client.execute("1 + 1")
+        self.assertIs(self.client.session, session)
+        self.client.close()
+        self.assertIsNot(self.client.session, session)
+
+    def test_execute_paged(self):
+        for prefetch in (0, 2):
+            results = self.client.execute_paged(
+                "g.inject(x, 2, 3, 4, 5, 6, 7)", bindings={"x": 1},
+                page_size=3, prefetch=prefetch)
+            self.assertEqual(list(results), [1, 2, 3, 4, 5, 6, 7])
+
+    def test_execute_many(self):
+        requests = [("x", {"x": i}) for i in range(20)]
+        requests.append("x + x.fasdfewq")
+        requests.append({"gremlin": "x + x", "bindings": {"x": 1}})
+        results = list(self.client.execute_many(requests, max_workers=4))
+        self.assertEqual([r.data[0] for r in results[:20]], list(range(20)))
+        self.assertIsInstance(results[20], GremlinServerError)
+        self.assertEqual(results[21].data[0], 2)
+        results = dict(self.client.execute_many(requests, ordered=False))
+        self.assertEqual(sorted(results), list(range(22)))
+        self.assertEqual(results[5].data[0], 5)
+
+    def test_prepare(self):
+        prepared = self.client.prepare("x + x", bindings=["x"])
+        self.assertEqual(json.loads(prepared.encode({"x": 1}).decode()),
+                         {"gremlin": "x + x", "language": "gremlin-groovy",
+                          "bindings": {"x": 1}})
+        self.assertEqual(prepared({"x": 2}).data[0], 4)
+        self.assertEqual(prepared.execute(bindings={"x": 3}).data[0], 6)
+        self.assertRaises(ValueError, prepared, {"y": 1})
+        self.assertRaises(ValueError, self.client.prepare, "x + x",
+                          bindings=["y"])
+
+    def test_context_manager(self):
+        with GremlinRestClient(pool_maxsize=2) as client:
+            resp = client.execute("1 + 1")
+            self.assertEqual(resp.data[0], 2)
+        self.assertIsNone(client._session)
+
+
+class RecordingSession(object):
+
+    def __init__(self):
+        self.posts = []
+
+    def post(self, url, data=None, headers=None, **kwargs):
+        self.posts.append((data, headers))
+        resp = ChunkedResponse(b"", 1)
+        resp.status_code = 200
+        return resp
+
+
+class CompressionTestCase(unittest.TestCase):
+
+    def test_compression(self):
+        client = GremlinRestClient(compression="gzip",
+                                   compression_threshold=100)
+        client._session = session = RecordingSession()
+        client._post(client._url, b"x" * 10)
+        client._post(client._url, b"x" * 100)
+        (small, small_headers), (big, big_headers) = session.posts
+        self.assertEqual(small, b"x" * 10)
+        self.assertNotIn("content-encoding", small_headers)
+        self.assertEqual(gzip.decompress(big), b"x" * 100)
+        self.assertEqual(big_headers["content-encoding"], "gzip")
+
+    def test_unknown_compression(self):
+        self.assertRaises(ValueError, GremlinRestClient, compression="br")
+
+
+class ChunkedResponse(object):
+
+    def __init__(self, body, size):
+        self.body = body
+        self.size = size
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), self.size):
+            yield self.body[i:i + self.size]
+
+    def close(self):
+        self.closed = True
+
+
+class ResponseStreamTestCase(unittest.TestCase):
+
+    def test_chunked(self):
+        data = [{"id": 1, "label": u"caf\u00e9", "properties": {}},
+                12345, -2.5e10, None, True, [], "x"]
+        body = json.dumps({
+            "requestId": "abc",
+            "status": {"code": 200, "message": "", "attributes": {}},
+            "result": {"data": data, "meta": {"m": 1}}
+        }).encode("utf-8")
+        for size in (1, 3, 7, len(body)):
+            resp = ChunkedResponse(body, size)
+            stream = ResponseStream(resp)
+            self.assertEqual(list(stream), data)
+            self.assertEqual(stream.status_code, 200)
+            self.assertEqual(stream.metadata, {"m": 1})
+            self.assertTrue(resp.closed)
+
+    def test_execute_stream(self):
+        client = GremlinRestClient()
+        stream = client.execute_stream("[1, 2, 3]")
+        self.assertEqual(list(stream), [1, 2, 3])
+        self.assertEqual(stream.status_code, 200)
+
+    def test_execute_stream_error(self):
+        client = GremlinRestClient()
+        with self.assertRaises(GremlinServerError):
+            client.execute_stream("x + x.fasdfewq", bindings={"x": 1})
+
+
+class ResultCacheTestCase(unittest.TestCase):
+
+    def test_lru(self):
+        cache = ResultCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_ttl(self):
+        now = [0]
+        cache = ResultCache(ttl=10, clock=lambda: now[0])
+        cache.set("a", 1)
+        now[0] = 9
+        self.assertEqual(cache.get("a"), 1)
+        now[0] = 10
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate_tag(self):
+        cache = ResultCache()
+        cache.set("a", 1, tags=("people",))
+        cache.set("b", 2)
+        cache.invalidate("people")
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), 2)
+
+    def test_key(self):
+        self.assertEqual(ResultCache.key("x", {"a": 1, "b": 2}, "groovy"),
+                         ResultCache.key("x", {"b": 2, "a": 1}, "groovy"))
+        self.assertNotEqual(ResultCache.key("x", {"a": 1}, "groovy"),
+                            ResultCache.key("x", {"a": 2}, "groovy"))
+
+    def test_generation(self):
+        cache = ResultCache()
+        generation = cache.generation
+        cache.invalidate("people")
+        cache.set("a", 1, generation=generation)
+        self.assertIsNone(cache.get("a"))
+        cache.set("a", 1, generation=cache.generation)
+        self.assertEqual(cache.get("a"), 1)
+
+    def test_invalidated_while_in_flight(self):
+        client = GremlinRestClient(cache=ResultCache())
+
+        def send(*args):
+            client.invalidate_cache()  # A create finishing meanwhile
+            return Response(200, [1], "", {})
+        client._send = send
+        self.assertEqual(client.execute("x", cached=True).data, [1])
+        self.assertEqual(len(client.cache), 0)
+        self.assertEqual(client.execute("x", cached=True,
+                                        coalesce=True).data, [1])
+        self.assertEqual(len(client.cache), 0)
+
+    def test_client_cache(self):
+        graph = TinkerGraph(cache=ResultCache())
+        resp1 = graph.execute("x + x", bindings={"x": 1}, cached=True)
+        resp2 = graph.execute("x + x", bindings={"x": 1}, cached=True)
+        self.assertIs(resp1, resp2)
+        self.assertEqual(graph.cache.hits, 1)
+        graph.create({"label": "person", "name": "dave"})
+        self.assertEqual(len(graph.cache), 0)
+
+
+class FakeBatchClient(object):
+
+    def __init__(self):
+        self.scripts = []
+
+    def execute(self, gremlin, bindings=None, query_timeout=None):
+        self.scripts.append((gremlin, bindings))
+        if not gremlin.startswith("["):
+            return Response(200, [bindings["x"]], "", {})
+        data = [[True, [value]] for name, value in sorted(bindings.items())]
+        data[-1] = [False, "boom"]
+        return Response(200, data, "", {})
+
+
+class MicroBatcherTestCase(unittest.TestCase):
+
+    def test_batch(self):
+        client = FakeBatchClient()
+        batcher = MicroBatcher(client, max_wait=1, max_size=3)
+        with futures.ThreadPoolExecutor(max_workers=3) as executor:
+            results = [executor.submit(batcher.execute, "x + 1", {"x": i})
+                       for i in range(3)]
+        (script, bindings), = client.scripts
+        self.assertEqual(sorted(bindings), ["b0_x", "b1_x", "b2_x"])
+        self.assertIn("{ x ->\nx + 1\n}.call(b0_x)", script)
+        errors = [r.exception() for r in results if r.exception()]
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], GremlinServerError)
+        values = [r.result().data[0] for r in results if not r.exception()]
+        self.assertEqual(len(values), 2)
+
+    def test_single(self):
+        client = FakeBatchClient()
+        batcher = MicroBatcher(client, max_wait=0.01)
+        self.assertEqual(batcher.execute("x", {"x": 5}).data, [5])
+        self.assertEqual(client.scripts, [("x", {"x": 5})])
+
+    def test_compile_error(self):
+        client = FakeBatchClient()
+        execute = client.execute
+
+        def fail_combined(gremlin, bindings=None, query_timeout=None):
+            if gremlin.startswith("["):
+                raise GremlinServerError(
+                    500, "startup failed:\nScript1.groovy: 3: unexpected "
+                    "token: ) @ line 3, column 5.")
+            if gremlin == "x +":
+                raise GremlinServerError(500, "startup failed")
+            return execute(gremlin, bindings, query_timeout)
+        client.execute = fail_combined
+        batcher = MicroBatcher(client, max_wait=1, max_size=2)
+        with futures.ThreadPoolExecutor(max_workers=2) as executor:
+            good = executor.submit(batcher.execute, "x", {"x": 1})
+            bad = executor.submit(batcher.execute, "x +", {"x": 2})
+        self.assertEqual(good.result().data, [1])
+        self.assertIsInstance(bad.exception(), GremlinServerError)
+
+    def test_short_response(self):
+        client = FakeBatchClient()
+        client.execute = lambda gremlin, bindings=None, query_timeout=None: (
+            Response(200, [[True, [1]]], "", {}))
+        batcher = MicroBatcher(client, max_wait=1, max_size=2)
+        with futures.ThreadPoolExecutor(max_workers=2) as executor:
+            results = [executor.submit(batcher.execute, "x", {"x": i})
+                       for i in range(2)]
+            done, _ = futures.wait(results, timeout=5)
+        self.assertEqual(len(done), 2)
+        errors = [r.exception() for r in results if r.exception()]
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], RuntimeError)
+
+
+class SingleFlightTestCase(unittest.TestCase):
+
+    def test_threads(self):
+        flight = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return len(calls)
+        with futures.ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(
+                lambda _: flight.do("key", slow), range(8)))
+        self.assertEqual(results, [1] * 8)
+        self.assertEqual(flight.shared, 7)
+        self.assertEqual(len(flight), 0)
+        self.assertEqual(flight.do("key", slow), 2)
+
+    def test_threads_error(self):
+        flight = SingleFlight()
+
+        def fail():
+            time.sleep(0.1)
+            raise RequestError(400, "bad")
+        with futures.ThreadPoolExecutor(max_workers=4) as executor:
+            results = [executor.submit(flight.do, "key", fail)
+                       for _ in range(4)]
+        for future in results:
+            self.assertIsInstance(future.exception(), RequestError)
+
+    def test_asyncio(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return len(calls)
+
+        async def go():
+            return await asyncio.gather(
+                *[flight.do("key", slow) for _ in range(5)])
+        self.assertEqual(asyncio.run(go()), [1] * 5)
+        self.assertEqual(flight.shared, 4)
+        self.assertEqual(len(flight), 0)
+
+    def test_client(self):
+        client = GremlinRestClient(coalesce=True)
+        with futures.ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(
+                lambda _: client.execute("x + x", bindings={"x": 1}),
+                range(4)))
+        self.assertEqual([r.data[0] for r in results], [2] * 4)
+
+
+class StatsTestCase(unittest.TestCase):
+
+    def test_histogram(self):
+        histogram = Histogram(bounds=(1, 2, 4, 8))
+        for value in (0.5, 1, 3, 3, 100):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 0, 2, 0, 1])
+        self.assertEqual(histogram.percentile(50), 4)
+        self.assertEqual(histogram.percentile(100), 100)
+        self.assertEqual(histogram.snapshot()["count"], 5)
+
+    def test_hooks(self):
+        client = GremlinRestClient()
+        before, after = [], []
+        client.register_hook("before_request", before.append)
+        client.register_hook("after_request", after.append)
+        client.execute("1 + 1")
+        with self.assertRaises(GremlinServerError):
+            client.execute("x + x.fasdfewq", bindings={"x": 1})
+        self.assertEqual(len(before), 2)
+        self.assertEqual([m.status_code for m in after], [200, 597])
+        self.assertEqual(after[0].result_count, 1)
+        self.assertIsNotNone(after[1].error)
+        self.assertEqual(client.stats.requests, 2)
+        self.assertEqual(client.stats.errors, 1)
+        self.assertEqual(
+            client.stats.histograms["total_seconds"].count, 2)
+        with self.assertRaises(ValueError):
+            client.register_hook("on_error", after.append)
+
+    def test_create_hook(self):
+        graph = TinkerGraph()
+        creates = []
+        graph.register_hook("create", creates.append)
+        graph.create({"label": "person", "name": "dave"})
+        self.assertEqual(creates[0].binding_count, 2)
+        self.assertEqual(
+            graph.stats.histograms["create_script_length"].count, 1)
+
+
+class Flaky(object):
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+class RetryTestCase(unittest.TestCase):
+
+    def test_retry(self):
+        policy = RetryPolicy(max_attempts=3, sleep=lambda delay: None)
+        func = Flaky(GremlinServerError(598, ""), GremlinServerError(500, ""))
+        self.assertEqual(policy.call(func), "ok")
+        self.assertEqual(func.calls, 3)
+
+    def test_give_up(self):
+        policy = RetryPolicy(max_attempts=2, retry_on={598: 3},
+                             sleep=lambda delay: None)
+        func = Flaky(GremlinServerError(500, ""))
+        self.assertRaises(GremlinServerError, policy.call, func)
+        func = Flaky(RequestError(499, ""))
+        self.assertRaises(RequestError, policy.call, func)
+        self.assertEqual(func.calls, 1)
+        func = Flaky(*[GremlinServerError(598, "")] * 3)
+        self.assertRaises(GremlinServerError, policy.call, func)
+        self.assertEqual(func.calls, 3)
+
+    def test_budget(self):
+        budget = RetryBudget(ratio=0, reserve=1)
+        policy = RetryPolicy(budget=budget, sleep=lambda delay: None)
+        func = Flaky(*[GremlinServerError(500, "")] * 2)
+        self.assertRaises(GremlinServerError, policy.call, func)
+        self.assertEqual(func.calls, 2)
+
+    def test_backoff(self):
+        policy = RetryPolicy(backoff=1, max_backoff=3, jitter=0)
+        self.assertEqual([policy.delay(i) for i in (1, 2, 3)], [1, 2, 3])
+
+    def test_hedge(self):
+        calls = []
+
+        def func():
+            calls.append(None)
+            if len(calls) == 1:
+                time.sleep(1)
+                return "slow"
+            return "fast"
+        with futures.ThreadPoolExecutor(2) as executor:
+            policy = HedgePolicy(delay=0.01)
+            self.assertEqual(policy.call(func, executor), "fast")
+
+    def test_execute(self):
+        client = GremlinRestClient()
+        resp = client.execute("1 + 1", retry=True, hedge=True)
+        self.assertEqual(resp.data[0], 2)
+
+
+class LoadBalancerTestCase(unittest.TestCase):
+
+    def test_circuit_breaker(self):
+        now = [0]
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=10,
+                                 clock=lambda: now[0])
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        now[0] = 10
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())  # One probe at a time
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        now[0] = 20
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_round_robin(self):
+        balancer = LoadBalancer(["a", "b", "c"], failure_threshold=1)
+        urls = []
+        for _ in range(3):
+            endpoint = balancer.acquire()
+            urls.append(endpoint.url)
+            balancer.release(endpoint, 0.1)
+        self.assertEqual(urls, ["a", "b", "c"])
+        endpoint = balancer.acquire()
+        balancer.release(endpoint, 0.1, GremlinServerError(500, ""))
+        self.assertEqual(
+            set(balancer.acquire().url for _ in range(4)), set(["b", "c"]))
+
+    def test_least_outstanding(self):
+        balancer = LoadBalancer(["a", "b"], strategy="least_outstanding")
+        first = balancer.acquire()
+        second = balancer.acquire()
+        self.assertNotEqual(first.url, second.url)
+        balancer.release(first, 0.01)
+        balancer.release(second, 1.0)
+        self.assertEqual(balancer.acquire().url, first.url)
+
+    def test_intermittent_errors(self):
+        balancer = LoadBalancer(["a", "b"])
+        flaky, healthy = balancer.endpoints
+        for i in range(40):
+            endpoint = balancer.acquire()
+            error = None
+            if endpoint is flaky and flaky.requests % 2:
+                error = GremlinServerError(500, "")
+            balancer.release(endpoint, 0.01, error)
+        self.assertEqual(flaky.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(healthy.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(set(balancer.acquire().url for _ in range(4)),
+                         set(["b"]))
+
+    def test_slow_endpoint(self):
+        balancer = LoadBalancer(["a", "b", "c"])
+        latencies = {"a": 0.01, "b": 0.012, "c": 0.5}
+        for _ in range(30):
+            endpoint = balancer.acquire()
+            balancer.release(endpoint, latencies[endpoint.url])
+        fast, other, slow = balancer.endpoints
+        self.assertEqual(slow.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(fast.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(other.breaker.state, CircuitBreaker.CLOSED)
+        self.assertLess(slow.requests, 10)
+
+    def test_all_unavailable(self):
+        balancer = LoadBalancer(["a"], failure_threshold=1)
+        balancer.release(balancer.acquire(), 0.1, GremlinServerError(598, ""))
+        self.assertRaises(EndpointUnavailableError, balancer.acquire)
+
+    def test_client(self):
+        client = GremlinRestClient(
+            url=["http://localhost:1", "http://localhost:8182"])
+        policy = RetryPolicy(sleep=lambda delay: None)
+        for _ in range(10):
+            resp = client.execute("1 + 1", retry=policy)
+            self.assertEqual(resp.data[0], 2)
+        dead, alive = client.balancer.endpoints
+        self.assertEqual(dead.breaker.state, CircuitBreaker.OPEN)
+
+
+class LimiterTestCase(unittest.TestCase):
+
+    def test_base_class(self):
+        self.assertRaises(TypeError, ConcurrencyLimiter)
+
+    def test_aimd(self):
+        now = [100.0]
+        limiter = AIMDLimiter(initial_limit=10, clock=lambda: now[0])
+        for _ in range(5):
+            limiter.acquire()
+        for _ in range(5):
+            limiter.release(0.01)
+        self.assertGreater(limiter._limit, 10)
+        limiter.acquire()
+        limiter.acquire()
+        limiter.release(1.0, GremlinServerError(598, "timeout"))
+        self.assertEqual(limiter.limit, 9)
+        # Started before the drop, so it does not lower the limit again
+        limiter.release(1.0, GremlinServerError(598, "timeout"))
+        self.assertEqual(limiter.limit, 9)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_gradient(self):
+        limiter = GradientLimiter(initial_limit=20, smoothing=1.0)
+        for latency in (0.01, 0.1, 0.1, 0.1):
+            limiter.acquire()
+            limiter.release(latency)
+        self.assertLess(limiter.limit, 20)
+        self.assertGreaterEqual(limiter.limit, limiter.min_limit)
+
+    def test_blocks_at_limit(self):
+        limiter = AIMDLimiter(initial_limit=2, max_limit=2)
+        peak = []
+
+        def work():
+            limiter.acquire()
+            peak.append(limiter.in_flight)
+            time.sleep(0.01)
+            limiter.release(0.01)
+        with futures.ThreadPoolExecutor(max_workers=6) as executor:
+            for _ in range(12):
+                executor.submit(work)
+        self.assertLessEqual(max(peak), 2)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_client_gauge(self):
+        client = GremlinRestClient(limiter=AIMDLimiter(initial_limit=4))
+        client._session = RecordingSession()
+        client._post(client._url, b"{}")
+        gauges = client.stats.snapshot()["gauges"]
+        self.assertEqual(gauges["concurrency_limit"], 4)
+        self.assertEqual(gauges["in_flight"], 0)
+
+
+class SerializerTestCase(unittest.TestCase):
+
+    def test_round_trip(self):
+        for name in ("orjson", "ujson", "rapidjson", "json"):
+            try:
+                serializer = get_serializer(name)
+            except ImportError:
+                continue
+            data = serializer.dumps({"gremlin": "x", "bindings": {"x": 1}})
+            self.assertIsInstance(data, bytes)
+            self.assertEqual(serializer.loads(data)["bindings"], {"x": 1})
+
+    def test_get_serializer(self):
+        serializer = JSONSerializer()
+        self.assertIs(get_serializer(serializer), serializer)
+        self.assertIsInstance(get_serializer(), JSONSerializer)
+        with self.assertRaises(ValueError):
+            get_serializer("yaml")
+
+    def test_stdlib_compatible(self):
+        big = 10 ** 30
+        for name in (None, "orjson", "ujson", "rapidjson", "json"):
+            try:
+                serializer = get_serializer(name)
+            except ImportError:
+                continue
+            for obj in ({"x": 2 ** 64}, {1: "a"}):
+                self.assertEqual(json.loads(serializer.dumps(obj).decode()),
+                                 json.loads(json.dumps(obj)))
+        self.assertEqual(get_serializer().loads(b'{"x": %d}' % big)["x"], big)
+
+    def test_fallback(self):
+        class Strict(object):
+            """Rejects what rapidjson rejects."""
+
+            def dumps(self, obj):
+                if any(not isinstance(key, str) for key in obj):
+                    raise TypeError("keys must be strings")
+                if any(value != value for value in obj.values()):
+                    raise ValueError("NaN is not allowed")
+                return json.dumps(obj)
+        serializer = RapidjsonSerializer.__new__(RapidjsonSerializer)
+        serializer._rapidjson = Strict()
+        serializer.decode = False
+        for obj in ({1: "a"}, {"x": float("nan")}, {"x": 1}):
+            self.assertEqual(serializer.dumps(obj),
+                             json.dumps(obj).encode("utf-8"))
+
+    def test_client_serializer(self):
+        client = GremlinRestClient(serializer="json")
+        self.assertEqual(client.serializer.name, "json")
+        resp = client.execute("x + x", bindings={"x": 1})
+        self.assertEqual(resp.data[0], 2)
+
 
 class GraphTestCase(unittest.TestCase):
 
@@ -72,6 +706,332 @@ class GraphTestCase(unittest.TestCase):
         self.assertEqual(e2.source_id, v3.id)
         self.assertEqual(e2.target_id, v1.id)
 
+    def test_create_edge_properties(self):
+        d = {"label": "person", "name": "dave"}
+        p = {"label": "lang", "name": "python"}
+        resp = self.graph.create((d, "LIKES", p, {"weight": 1}))
+        edge, = resp.edges
+        self.assertEqual(edge.properties["weight"], 1)
+
+    def test_bulk_create(self):
+        def elements():
+            prev = None
+            for i in range(5):
+                vertex = {"label": "person", "num": i}
+                yield vertex
+                if prev is not None:
+                    yield (prev, "NEXT", vertex)
+                prev = vertex
+        colls = list(self.graph.bulk_create(elements(), batch_size=2))
+        self.assertEqual(len(colls), 5)
+        vertices = [v for c in colls for v in c.vertices]
+        edges = [e for c in colls for e in c.edges]
+        self.assertEqual(len(vertices), 5)
+        self.assertEqual(len(edges), 4)
+        for i, edge in enumerate(edges):
+            self.assertEqual(edge.source_id, vertices[i].id)
+            self.assertEqual(edge.target_id, vertices[i + 1].id)
+
+    def test_upsert(self):
+        first = self.graph.upsert(
+            ({"label": "person", "name": "upsert-dave"}, "USES",
+             {"label": "lang", "name": "upsert-python"}))
+        second = self.graph.upsert(
+            ({"label": "person", "name": "upsert-dave"}, "USES",
+             {"label": "lang", "name": "upsert-python"}),
+            {"label": "lang", "name": "upsert-groovy"})
+        self.assertEqual(second.vertices.ids()[:2], first.vertices.ids())
+        self.assertEqual(second.edges[0].id, first.edges[0].id)
+        self.assertEqual(len(second.vertices), 3)
+
+    def test_upsert_dedupe(self):
+        d1 = {"label": "person", "name": "dave"}
+        d2 = {"label": "person", "name": "dave"}
+        p = {"label": "lang", "name": "python"}
+        _, bindings, _ = Graph.upsert(
+            self.graph, (d1, "USES", p), (d2, "USES", p), d1)
+        self.assertEqual(bindings["keyValues"],
+                         {"person": ["dave"], "lang": ["python"]})
+        self.assertEqual(len(bindings["vertices"]), 2)
+        self.assertEqual(len(bindings["edges"]), 1)
+        self.assertRaises(ValueError, Graph.upsert, self.graph, {"age": 3})
+
+    def test_upsert_labels(self):
+        _, bindings, _ = Graph.upsert(
+            self.graph, ({"label": "person", "name": "x"}, "USES",
+                         {"label": "software", "name": "x"}), {"name": "x"})
+        self.assertEqual(bindings["keyValues"],
+                         {"person": ["x"], "software": ["x"], "": ["x"]})
+        self.assertEqual(len(bindings["vertices"]), 3)
+        self.assertEqual(bindings["edges"], [[0, "USES", 1, []]])
+
+    def test_bulk_create_untracked(self):
+        graph = TinkerGraph()
+        graph._create = lambda script, bindings: graph._build_collection(
+            [[{"id": i, "label": "vertex", "properties": {}}
+              for i in range(len(graph._local.new_vertices))], []])
+        a = {"name": "a"}
+        b = {"name": "b"}
+        batches = graph.bulk_create([a, b, (a, "KNOWS", b)], batch_size=1,
+                                    max_tracked=1)
+        next(batches)
+        next(batches)
+        self.assertRaises(ValueError, next, batches)
+
+    def test_create_threads(self):
+        graph = Graph()
+
+        def build(i):
+            script, bindings, alias = graph.create(
+                {"name": i}, {"name": -i}, (0, "KNOWS", 1))
+            vertices = re.findall(r"(v\d+) = graph.addVertex", script)
+            edges = re.findall(r"(e\d+) = ", script)
+            self.assertEqual(alias, "[[%s], [%s]];" % (
+                ",".join(vertices), ",".join(edges)))
+            self.assertEqual(len(set(vertices)), 2)
+            self.assertEqual(sorted(bindings.values()), sorted([i, -i]))
+        with futures.ThreadPoolExecutor(max_workers=16) as executor:
+            list(executor.map(build, range(1, 3001)))
+
+
+class LazyElementsTestCase(unittest.TestCase):
+
+    def test_lazy(self):
+        raw = [{"id": 1, "label": "person", "properties": {}},
+               {"id": 2, "label": "lang", "properties": {}}]
+        built = []
+
+        def factory(element):
+            built.append(element["id"])
+            return Vertex(element["id"], element["label"],
+                          element["properties"])
+        vertices = LazyElements(raw, factory)
+        self.assertEqual(len(vertices), 2)
+        self.assertEqual(vertices.ids(), [1, 2])
+        self.assertEqual(built, [])
+        self.assertEqual(vertices[-1].label, "lang")
+        self.assertEqual(built, [2])
+        first, second = vertices
+        self.assertEqual(first.id, 1)
+        self.assertEqual(vertices, (first, second))
+
+    def test_eager(self):
+        graph = Graph(lazy=False)
+        coll = graph._build_collection(
+            [[{"id": 1, "label": "person", "properties": {}}], []])
+        self.assertEqual(coll.vertices, (Vertex(1, "person", {}),))
+        self.assertEqual(coll.edges, ())
+
+
+class FlattenTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.data = json.loads(json.dumps([
+            [{"id": i, "label": "person",
+              "properties": {"name": [{"id": 10 + i, "value": "dave"}],
+                             "nick": [{"id": 20 + i, "value": "d"},
+                                      {"id": 30 + i, "value": "dv"}]}}
+             for i in range(2)],
+            [{"id": 5, "label": "KNOWS", "outV": 0, "inV": 1,
+              "properties": {"weight": 1}}]]))
+
+    def test_flatten(self):
+        graph = Graph(lazy=False, flatten=True)
+        (v1, v2), (edge,) = graph._build_collection(self.data)
+        self.assertEqual(v1.properties, {"name": "dave", "nick": ["d", "dv"]})
+        self.assertIs(v1.label, v2.label)
+        self.assertIs(list(v1.properties)[0], list(v2.properties)[0])
+        self.assertEqual(edge.properties, {"weight": 1})
+
+    def test_property_ids(self):
+        graph = Graph(flatten=True, property_ids=True)
+        vertex = graph._build_collection(self.data).vertices[0]
+        self.assertEqual(vertex.properties["name"],
+                         VertexProperty(10, "dave", None))
+        self.assertEqual([p.id for p in vertex.properties["nick"]], [20, 30])
+
+
+class TemplatedGraphTestCase(GraphTestCase):
+
+    def setUp(self):
+        self.graph = TinkerGraph(templated=True)
+
+    def test_constant_script(self):
+        script1, _, alias1 = Graph.create(
+            self.graph, ({"label": "person", "name": "dave"}, "KNOWS",
+                         {"age": 34}, {"weight": 1}))
+        script2, _, alias2 = Graph.create(
+            self.graph, ({"label": "lang", "version": 3}, "USES",
+                         {"label": "os"}))
+        self.assertEqual(script1, script2)
+        self.assertEqual(alias1, alias2)
+
+
+class ColumnarTestCase(unittest.TestCase):
+
+    def test_from_graphson(self):
+        data = [
+            [{"id": 1, "label": "person",
+              "properties": {"name": [{"id": 5, "value": "dave"}],
+                             "age": [{"id": 6, "value": 34}]}},
+             {"id": 2, "label": "lang",
+              "properties": {"name": [{"id": 7, "value": "python"}]}}],
+            [{"id": 3, "label": "USES", "outV": 1, "inV": 2,
+              "properties": {"weight": 0.5}}]
+        ]
+        coll = ColumnarCollection.from_graphson(data)
+        self.assertEqual(list(coll.vertices.ids), [1, 2])
+        self.assertEqual(coll.vertices.labels, ["person", "lang"])
+        self.assertEqual(coll.vertices.properties["name"], ["dave", "python"])
+        self.assertEqual(coll.vertices.properties["age"], [34, None])
+        self.assertEqual(list(coll.edges.source_ids), [1])
+        self.assertEqual(list(coll.edges.properties["weight"]), [0.5])
+        vertices, edges = coll.to_collection()
+        self.assertEqual(vertices[1].properties, {"name": "python"})
+        self.assertEqual(edges[0].target_id, 2)
+
+    def test_create(self):
+        graph = TinkerGraph(columnar=True)
+        coll = graph.create(({"label": "person", "name": "dave"}, "KNOWS",
+                             {"label": "person", "name": "frens"}))
+        self.assertEqual(len(coll.vertices.ids), 2)
+        self.assertEqual(coll.vertices.properties["name"], ["dave", "frens"])
+        self.assertEqual(coll.edges.source_ids[0], coll.vertices.ids[0])
+
+
+class ScanGraph(TinkerGraph):
+    """Answers scan scripts from a list, like a server would."""
+
+    def __init__(self, elements):
+        super(ScanGraph, self).__init__()
+        self.elements = elements
+        self.requests = 0
+        self.unbounded = 0
+
+    def execute(self, gremlin, bindings=None, **kwargs):
+        self.requests += 1
+        if "order()" in gremlin and "P.lt(" not in gremlin:
+            self.unbounded += 1
+        data = [e for e in self.elements
+                if bindings.get("_scanLabel") in (None, e["label"])]
+        if "min()" in gremlin:
+            ids = [e["id"] for e in data]
+            if not all(isinstance(i, int) for i in ids):
+                # Like TinkerPop 3.0, whose min() only accepts numbers
+                raise GremlinServerError(500, "ClassCastException")
+            return Response(200, [min(ids), max(ids)], "", {})
+        if "P.gt(" in gremlin:
+            data = [e for e in data if e["id"] > bindings["_scanFrom"]]
+        if "P.gte(" in gremlin:
+            data = [e for e in data if e["id"] >= bindings["_scanFrom"]]
+        if "P.lt(" in gremlin:
+            data = [e for e in data if e["id"] < bindings["_scanHigh"]]
+        data.sort(key=lambda e: e["id"])
+        return Response(200, data[:bindings["_scanLimit"]], "", {})
+
+
+class ScanTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = ScanGraph([
+            {"id": i, "label": "person" if i % 2 else "lang",
+             "properties": {}} for i in range(25, 0, -1)])
+
+    def test_scan_vertices(self):
+        vertices = list(self.graph.scan_vertices(page_size=10))
+        self.assertEqual([v.id for v in vertices], list(range(1, 26)))
+        self.assertEqual(self.graph.requests, 4)
+        people = list(self.graph.scan_vertices(label="person", low=10,
+                                               high=20, page_size=2))
+        self.assertEqual([v.id for v in people], [11, 13, 15, 17, 19])
+
+    def test_scan_windows(self):
+        graph = ScanGraph([{"id": i, "label": "person", "properties": {}}
+                           for i in range(1000, 101000, 1000)])
+        vertices = list(graph.scan_vertices(page_size=10))
+        self.assertEqual([v.id for v in vertices],
+                         list(range(1000, 101000, 1000)))
+        self.assertEqual(graph.unbounded, 0)
+        self.assertLess(graph.requests, 25)
+
+    def test_scan_string_ids(self):
+        graph = ScanGraph([{"id": "v%02d" % i, "label": "person",
+                            "properties": {}} for i in range(25, 0, -1)])
+        vertices = list(graph.scan_vertices(page_size=10))
+        self.assertEqual([v.id for v in vertices],
+                         ["v%02d" % i for i in range(1, 26)])
+        handle, path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        self.assertEqual(export_jsonl(graph, path, page_size=4), 25)
+
+    def test_split_range(self):
+        self.assertEqual(split_range(0, 10, 3), [(0, 4), (4, 7), (7, 10)])
+        self.assertEqual(split_range(5, 7, 4), [(5, 6), (6, 7)])
+
+    def test_export_jsonl(self):
+        handle, path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        count = export_jsonl(self.graph, path, workers=3, page_size=4)
+        self.assertEqual(count, 25)
+        with open(path) as f:
+            ids = sorted(json.loads(line)["id"] for line in f)
+        self.assertEqual(ids, list(range(1, 26)))
+
+
+class ImporterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "w") as f:
+            f.write("name,age,kind\n")
+            for i in range(10):
+                f.write("p%s,%s,person\n" % (i, i))
+        self.checkpoint = self.path + ".checkpoint"
+        self.addCleanup(os.remove, self.path)
+
+    def test_read_records(self):
+        records = list(read_records(self.path))
+        self.assertEqual(records[0][1],
+                         {"name": "p0", "age": "0", "kind": "person"})
+        offset = records[4][0]
+        rest = [record for _, record in read_records(self.path,
+                                                     offset=offset)]
+        self.assertEqual(rest, [record for _, record in records[5:]])
+
+    def test_mapping(self):
+        mapping = ImportMapping(label_column="kind", types={"age": int})
+        self.assertEqual(mapping.element({"name": "p", "age": "3",
+                                          "kind": "person"}),
+                         {"name": "p", "age": 3, "label": "person"})
+        mapping = ImportMapping(kind="edge", label="KNOWS", key="name",
+                                source_column="a", target_column="b")
+        self.assertEqual(mapping.element({"a": "x", "b": "y", "w": "1"}),
+                         ({"name": "x"}, "KNOWS", {"name": "y"}, {"w": "1"}))
+        self.assertRaises(ValueError, ImportMapping, kind="edge",
+                          label="KNOWS")
+
+    def test_resume(self):
+        sent = []
+
+        def create(script, bindings):
+            if len(sent) == 2:
+                raise GremlinServerError(500, "")
+            sent.append(bindings["keyValues"][""])
+        graph = TinkerGraph()
+        graph._create = create
+        importer = Importer(graph, ImportMapping(key="name"), batch_size=3,
+                            workers=1, checkpoint=self.checkpoint)
+        self.addCleanup(os.remove, self.checkpoint)
+        self.assertRaises(GremlinServerError, importer.run, self.path)
+        self.assertEqual(importer.records, 6)
+        del sent[:]
+        count = Importer(graph, ImportMapping(key="name"), batch_size=3,
+                         checkpoint=self.checkpoint).run(self.path)
+        self.assertEqual(count, 4)
+        self.assertEqual(sent, [["p6", "p7", "p8"], ["p9"]])
+
 
 class TitanGraphTestCase(unittest.TestCase):
 
@@ -102,6 +1062,133 @@ class TitanGraphTestCase(unittest.TestCase):
         in_v, = resp.vertices
         self.assertEqual(edge.target_id, in_v.id)
 
+    def test_batch(self):
+        with self.graph.batch(commit_every=2) as batch:
+            first = self.graph.create({"label": "person", "name": "dave"})
+            second = self.graph.create(
+                ({"label": "person", "name": "frens"}, "KNOWS",
+                 {"label": "lang", "name": "python"}))
+            self.assertTrue(first.done())
+            third = self.graph.create({"label": "lang", "name": "groovy"})
+            self.assertFalse(third.done())
+        self.assertEqual(batch.committed, 3)
+        self.assertEqual(len(first.result().vertices), 1)
+        self.assertEqual(len(second.result().edges), 1)
+        self.assertEqual(third.result().vertices[0].label, "lang")
+
+    def test_batch_error(self):
+        with self.assertRaises(ValueError):
+            with self.graph.batch() as batch:
+                future = self.graph.create({"name": "dave"})
+                raise ValueError
+        self.assertTrue(future.cancelled())
+        self.assertEqual(batch.committed, 0)
+        self.assertIsNone(self.graph._batches.current)
+
+    def test_batch_cancel(self):
+        sent = []
+
+        def execute_create(script, bindings):
+            sent.extend(bindings["creates"])
+            return Response(200, [[[], []]] * len(bindings["creates"]), "",
+                            {})
+        self.graph._execute_create = execute_create
+        with self.graph.batch() as batch:
+            first = self.graph.create({"name": "dave"})
+            second = self.graph.create({"name": "frens"})
+            self.assertTrue(first.cancel())
+        self.assertEqual(len(sent), 1)
+        self.assertEqual(sent[0][0][0][2], ["name", "frens"])
+        self.assertTrue(second.done())
+        self.assertEqual(batch.committed, 1)
+
+    def test_batch_counts_elements(self):
+        self.graph._execute_create = lambda script, bindings: Response(
+            200, [[[], []]] * len(bindings["creates"]), "", {})
+        with self.graph.batch(commit_every=3):
+            future = self.graph.create(
+                ({"name": "dave"}, "KNOWS", {"name": "frens"}))
+            self.assertTrue(future.done())
+
+    def test_batch_short_response(self):
+        self.graph._execute_create = lambda script, bindings: Response(
+            200, [[[], []]], "", {})
+        with self.assertRaises(RuntimeError):
+            with self.graph.batch() as batch:
+                first = self.graph.create({"name": "dave"})
+                second = self.graph.create({"name": "frens"})
+        self.assertEqual(len(first.result().vertices), 0)
+        self.assertRaises(RuntimeError, second.result, timeout=1)
+        self.assertEqual(batch.committed, 1)
+
+
+class CountingSession(object):
+    """Wraps an aiohttp session, tracking the peak of concurrent posts."""
+
+    def __init__(self, session):
+        self.session = session
+        self.active = 0
+        self.peak = 0
+
+    def post(self, *args, **kwargs):
+        return CountedPost(self, self.session.post(*args, **kwargs))
+
+
+class CountedPost(object):
+
+    def __init__(self, counter, request):
+        self.counter = counter
+        self.request = request
+
+    async def __aenter__(self):
+        self.counter.active += 1
+        self.counter.peak = max(self.counter.peak, self.counter.active)
+        return await self.request.__aenter__()
+
+    async def __aexit__(self, *exc_info):
+        self.counter.active -= 1
+        return await self.request.__aexit__(*exc_info)
+
+
+@unittest.skipIf(aiohttp is None, "aiohttp not installed")
+class AsyncGremlinRestClientTestCase(unittest.TestCase):
+
+    def test_request(self):
+        async def go():
+            async with AsyncGremlinRestClient() as client:
+                resp = await client.execute("x + x", bindings={"x": 1})
+                self.assertEqual(resp.data[0], 2)
+        asyncio.run(go())
+
+    def test_error(self):
+        async def go():
+            async with AsyncGremlinRestClient() as client:
+                with self.assertRaises(GremlinServerError):
+                    await client.execute("x + x.fasdfewq", bindings={"x": 1})
+        asyncio.run(go())
+
+    def test_max_in_flight(self):
+        async def go():
+            async with AsyncGremlinRestClient(max_in_flight=2) as client:
+                session = CountingSession(client._get_session())
+                client._get_session = lambda: session
+                resps = await asyncio.gather(
+                    *[client.execute("x", bindings={"x": i})
+                      for i in range(10)])
+                self.assertEqual([r.data[0] for r in resps], list(range(10)))
+                self.assertEqual(session.peak, 2)
+        asyncio.run(go())
+
+    def test_create(self):
+        async def go():
+            async with AsyncTinkerGraph() as graph:
+                node1 = {"label": "person", "name": "dave", "age": 34}
+                resp = await graph.create(
+                    (node1, "KNOWS", 1), {"label": "lang", "name": "python"})
+                self.assertEqual(len(resp.vertices), 2)
+                self.assertEqual(len(resp.edges), 1)
+        asyncio.run(go())
+
 
 if __name__ == "__main__":
     unittest.main()